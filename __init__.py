@@ -1,9 +1,5 @@
 # -*- coding: utf-8 -*-
 import os
-import sys
-import csv
-import json
-import xml.etree.ElementTree as ET
 from aqt.qt import *
 from aqt import mw
 from aqt.utils import showInfo
@@ -12,252 +8,17 @@ from anki.hooks import addHook
 from PyQt6.QtGui import QAction
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QTextEdit, QComboBox, QWidget
 import re
-import unicodedata
-import sqlite3
 from .kanji_lookup import KanjiLookupDialog
 from . import update_pitch_accents
 from . import populate_words_with_translations
 # from . import update_related_words_by_frequency
-from .pitch_svg import hira_to_mora, create_svg_pitch_pattern, create_html_pitch_pattern, extract_unique_pitch_patterns
-# Add-on paths
-ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(ADDON_DIR, 'data')
-JM_DICT_PATH = os.path.join(DATA_DIR, 'JMdict_e_examp.XML')
-PITCH_DB_PATH = os.path.join(DATA_DIR, 'wadoku_pitchdb.csv')
-KANJI_INFO_PATH = os.path.join(DATA_DIR, '常用漢字の書き取り.json')
-PITCH_DB_SQLITE_PATH = os.path.join(DATA_DIR, 'wadoku_pitchdb.sqlite')
-JMDICT_JSON_PATH = os.path.join(DATA_DIR, 'JMdict_e_examp.json')
-JMDICT_SQLITE_PATH = os.path.join(DATA_DIR, 'JMdict_e_examp.sqlite')
-
-# --- Load Kanji Info JSON ---
-try:
-    with open(KANJI_INFO_PATH, 'r', encoding='utf-8') as f:
-        KANJI_INFO_DB = json.load(f)
-except Exception:
-    KANJI_INFO_DB = []
-
-# --- Convert CSV to SQLite if needed ---
-def ensure_pitchdb_sqlite():
-    if os.path.exists(PITCH_DB_SQLITE_PATH):
-        return
-    if not os.path.exists(PITCH_DB_PATH):
-        return
-    import sqlite3
-    import re
-    try:
-        conn = sqlite3.connect(PITCH_DB_SQLITE_PATH)
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS pitch_accents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            kanji TEXT,
-            kana TEXT,
-            accented_kana TEXT,
-            pitch_number TEXT,
-            pattern TEXT
-        )''')
-        c.execute('CREATE INDEX IF NOT EXISTS idx_pitch_kanji ON pitch_accents(kanji)')
-        c.execute('CREATE INDEX IF NOT EXISTS idx_pitch_kana ON pitch_accents(kana)')
-        with open(PITCH_DB_PATH, 'r', encoding='utf-8') as f:
-            next(f, None)
-            for line in f:
-                parts = line.strip().split('␞')
-                if len(parts) < 5:
-                    continue
-                kanji_column = parts[0]
-                kana_column = parts[1]
-                accented_kana = parts[2]
-                pitch_number = parts[3]
-                pitch_pattern = parts[4]
-                # Split by ␟ and remove special chars
-                kanji_list = [re.sub(r'[△×…]', '', k) for k in kanji_column.split('␟') if k]
-                kana_list = [re.sub(r'[△×…]', '', k) for k in kana_column.split('␟') if k]
-                for kanji in kanji_list or ['']:
-                    for kana in kana_list or ['']:
-                        c.execute('INSERT INTO pitch_accents (kanji, kana, accented_kana, pitch_number, pattern) VALUES (?, ?, ?, ?, ?)',
-                                  (kanji, kana, accented_kana, pitch_number, pitch_pattern))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        pass
-
-# --- On-demand Pitch Accent Lookup (no global index) ---
-_pitch_accent_cache = {}
-
-def lookup_pitch_accent(word):
-    """Lookup pitch accent for a word from wadoku_pitchdb.sqlite, with in-memory cache."""
-    if word in _pitch_accent_cache:
-        return _pitch_accent_cache[word]
-    ensure_pitchdb_sqlite()
-    if not os.path.exists(PITCH_DB_SQLITE_PATH):
-        return [], '', [], ''
-    import sqlite3
-    entries = []
-    try:
-        conn = sqlite3.connect(PITCH_DB_SQLITE_PATH)
-        c = conn.cursor()
-        # If input is a single kanji, fetch all readings for that kanji
-        if len(word) == 1 and '\u4e00' <= word <= '\u9fff':
-            c.execute('SELECT kana, accented_kana, pitch_number, pattern FROM pitch_accents WHERE kanji=?', (word,))
-        else:
-            # Otherwise, search both kanji and kana columns as before
-            c.execute('SELECT kana, accented_kana, pitch_number, pattern FROM pitch_accents WHERE kanji=? OR kana=?', (word, word))
-        for row in c.fetchall():
-            kana, accented_kana, pitch_number, pattern = row
-            pitch_entry = {
-                "kana": kana,
-                "accented_kana": accented_kana,
-                "pitch_number": pitch_number,
-                "pattern": pattern
-            }
-            entries.append(pitch_entry)
-        conn.close()
-    except Exception:
-        pass
-    if not entries:
-        result = ([], '', [], '')
-    else:
-        # Collect all unique accented_kanas readings in order
-        accented_kanas = []
-        seen = set()
-        for e in entries:
-            ak = e["accented_kana"]
-            if ak and ak not in seen:
-                accented_kanas.append(ak)
-                seen.add(ak)
-        pitch_patterns = [e["pattern"] for e in entries]
-        normal_kanas = []
-        seen_kana = set()
-        for e in entries:
-            kana = e["kana"]
-            if kana and kana not in seen_kana:
-                normal_kanas.append(kana)
-                seen_kana.add(kana)
-        result = (accented_kanas, accented_kanas[0] if accented_kanas else '', pitch_patterns, normal_kanas[0] if normal_kanas else '')
-    _pitch_accent_cache[word] = result
-    return result
-
-# --- SQLite-based JMdict Lookup ---
-def ensure_jmdict_sqlite():
-    """Create SQLite DB from JSON if not present."""
-    if os.path.exists(JMDICT_SQLITE_PATH):
-        return
-    if not os.path.exists(JMDICT_JSON_PATH):
-        return
-    try:
-        with open(JMDICT_JSON_PATH, 'r', encoding='utf-8') as f:
-            jmdict_data = json.load(f)
-        conn = sqlite3.connect(JMDICT_SQLITE_PATH)
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS entries (
-            word TEXT PRIMARY KEY,
-            data TEXT
-        )''')
-        for word, entries in jmdict_data.items():
-            c.execute('INSERT OR REPLACE INTO entries (word, data) VALUES (?, ?)', (word, json.dumps(entries, ensure_ascii=False)))
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        pass
-
-_ensure_sqlite_ran = False
-
-def lookup_jmdict(word):
-    global _JMDICT_JSON_CACHE, _ensure_sqlite_ran
-    if not _ensure_sqlite_ran:
-        ensure_jmdict_sqlite()
-        _ensure_sqlite_ran = True
-    # Try SQLite lookup first
-    if os.path.exists(JMDICT_SQLITE_PATH):
-        try:
-            conn = sqlite3.connect(JMDICT_SQLITE_PATH)
-            c = conn.cursor()
-            c.execute('SELECT data FROM entries WHERE word=?', (word,))
-            row = c.fetchone()
-            conn.close()
-            if row:
-                return json.loads(row[0])
-        except Exception:
-            pass
-    # Fallback to JSON cache
-    if _JMDICT_JSON_CACHE is None:
-        if os.path.exists(JMDICT_JSON_PATH):
-            try:
-                with open(JMDICT_JSON_PATH, 'r', encoding='utf-8') as f:
-                    _JMDICT_JSON_CACHE = json.load(f)
-            except Exception:
-                _JMDICT_JSON_CACHE = {}
-        else:
-            _JMDICT_JSON_CACHE = {}
-    return _JMDICT_JSON_CACHE.get(word, [])
-
-# Ensure SQLite DB is created at startup if possible
-ensure_jmdict_sqlite()
-
-# --- Build JMdict Index (legacy, only if JSON not present) ---
-JMDICT_INDEX = {}
-if not os.path.exists(JMDICT_JSON_PATH) and os.path.exists(JM_DICT_PATH):
-    tree = ET.parse(JM_DICT_PATH)
-    root = tree.getroot()
-    for entry in root.findall('entry'):
-        kanjis = [keb.text for k_ele in entry.findall('k_ele') for keb in k_ele.findall('keb') if keb.text]
-        kanas = [reb.text for r_ele in entry.findall('r_ele') for reb in r_ele.findall('reb') if reb.text]
-        meanings = []
-        for sense in entry.findall('sense'):
-            glosses = [g.text for g in sense.findall('gloss') if g.text]
-            if glosses:
-                meanings.append('; '.join(glosses))
-        for key in kanjis + kanas:
-            JMDICT_INDEX.setdefault(key, []).append({'kanjis': kanjis, 'kanas': kanas, 'meanings': meanings})
-    # Save as JSON for future fast loading
-    try:
-        with open(JMDICT_JSON_PATH, 'w', encoding='utf-8') as f:
-            json.dump(JMDICT_INDEX, f, ensure_ascii=False)
-    except Exception:
-        pass
-
-# --- Sentence Lookup ---
-import importlib.util
-SENTENCE_LOOKUP_PATH = os.path.join(ADDON_DIR, 'sentence_lookup.py')
-lookup_sentences_and_related = None
-if os.path.exists(SENTENCE_LOOKUP_PATH):
-    spec = importlib.util.spec_from_file_location('sentence_lookup', SENTENCE_LOOKUP_PATH)
-    sentence_lookup = importlib.util.module_from_spec(spec)
-    sys.modules['sentence_lookup'] = sentence_lookup
-    spec.loader.exec_module(sentence_lookup)
-    lookup_sentences_and_related = sentence_lookup.lookup_sentences_and_related
-else:
-    def lookup_sentences_and_related(word):
-        return [], []
-
-def get_example_sentences(word):
-    examples, _ = lookup_sentences_and_related(word)
-    return examples
-
-# --- Kanji Info Lookup ---
-def get_kanji_info_blocks(word):
-    blocks = []
-    for ch in word:
-        if ord(ch) < 0x4e00 or ord(ch) > 0x9fff:
-            continue
-        for entry in KANJI_INFO_DB:
-            # Use the kanji as the key for matching
-            if entry.get('kanji') == ch:
-                block = {
-                    'kanji': ch,
-                    'reading_on': entry.get('reading_on', ''),
-                    'reading_kun': entry.get('reading_kun', ''),
-                    'strokes': entry.get('number_of_strokes', ''),
-                    'radical': entry.get('radical', ''),
-                    'meaning': entry.get('meaning', ''),
-                    'kanken_level': entry.get('kanken_level', ''),
-                    'stroke_order': entry.get('stroke_order', ''),
-                    'radical_reading': entry.get('radical_reading', ''),
-                    'radical_information': entry.get('radical_information', ''),
-                    'related_words': [w.strip() for w in entry.get('related_words', '').split(',') if w.strip()][:20]
-                }
-                blocks.append(block)
-                break
-    return blocks
+from .pitch_svg import pitch_field, pitch_pairs, check_field_format
+from .dictdata import (
+    PITCH_DB_SQLITE_PATH, get_connection, once, ensure_pitchdb_sqlite,
+    lookup_pitch_accent, lookup_jmdict, get_kanji_info_blocks, get_word_info, get_example_sentences,
+)
+from .first_run_build import start_first_run_build
+from .card_template import compile_template, read_review_templates
 
 class JapaneseWordCardCreator(QDialog):
     def __init__(self, parent=None):
@@ -310,27 +71,27 @@ class JapaneseWordCardCreator(QDialog):
 
 # --- Modified card creation logic to support deck and preview ---
 def create_japanese_word_card(word, deck_id=None, preview_only=False):
+    # Gather pitch, JMdict, kanji info and local examples in one pass
+    info = get_word_info(word)
     # Reading: try to get from wadoku_pitchdb accented kana (column 3)
-    readings, accented_kana, pitch_patterns, normal_kana = lookup_pitch_accent(word)
+    readings = info.accented_readings()
     # Join all readings for display
     reading = '、'.join(readings) if readings else ''
     # Fallback: try to get from JMdict entry (kana)
-    jmdict_entries = lookup_jmdict(word)
+    jmdict_entries = info.jmdict_entries
     if not reading and jmdict_entries:
         kanas = jmdict_entries[0].get('kanas', [])
         if kanas:
             reading = kanas[0]
     # Meanings
     meanings = []
-    if jmdict_entries:
-        for entry in jmdict_entries:
-            for m in entry['meanings']:
-                for part in m.split(';'):
-                    part = part.strip()
-                    if part:
-                        meanings.append(part)
-    # Example sentences
-    examples = get_example_sentences(word)
+    for m in info.meanings():
+        for part in m.split(';'):
+            part = part.strip()
+            if part:
+                meanings.append(part)
+    # Example sentences: stored ones first, online lookup only when there are none
+    examples = info.examples or get_example_sentences(word)
     # Render each example as a jp-en-pair block, Japanese and English on separate lines, extra margin between blocks
     examples_str = ''.join(
         f'<div class="jp-en-pair" style="margin-bottom: 18px;">'
@@ -343,26 +104,10 @@ def create_japanese_word_card(word, deck_id=None, preview_only=False):
     meanings_str = ''.join(f'<div class="meaning-block" style="margin-bottom: 14px;">{m}</div>' for m in meanings)
     # Pitch accent SVG: use each unique (kana, pattern) pair
     pitch_html = ''
-    if jmdict_entries or pitch_patterns:
-        # Use lookup_pitch_accent to get DB entries, then deduplicate
-        entries = []
-        try:
-            conn = sqlite3.connect(PITCH_DB_SQLITE_PATH)
-            c = conn.cursor()
-            c.execute('SELECT kana, pattern FROM pitch_accents WHERE kanji=? OR kana=?', (word, word))
-            for row in c.fetchall():
-                kana, pattern = row
-                entries.append({'kana': kana, 'pattern': pattern})
-            conn.close()
-        except Exception:
-            pass
-        unique_pitch = extract_unique_pitch_patterns(entries)
-        for entry in unique_pitch:
-            formatted_pattern = format_pitch_pattern(entry['pattern'])
-            svg = create_html_pitch_pattern(entry['kana'], formatted_pattern)
-            pitch_html += f'<div class="pitch-accent-block">{svg}</div>'
+    if jmdict_entries or info.pitch_entries:
+        pitch_html = pitch_field(pitch_pairs(info.pitch_entries))
     # Kanji info
-    kanji_blocks = get_kanji_info_blocks(word)
+    kanji_blocks = info.kanji_blocks
     kanji_info_str = ''
     for block in kanji_blocks:
         kanji_info_str += f"""
@@ -380,11 +125,20 @@ def create_japanese_word_card(word, deck_id=None, preview_only=False):
             <div class='kanji-attr'><b>関連語:</b> {', '.join(block['related_words'])}</div>
         </div>
         """
+    front_template, back_template, card_css = card_templates()
     # --- Removed baked-in CSS and card_template variable ---
     # The card_template and inline CSS have been removed. Card rendering will use external template and CSS files.
+    # For preview, use the actual values, not field names
+    card_html = compiled_card_templates()[0].render({
+        'word': word,
+        'reading': reading,
+        'meanings': meanings_str,
+        'example sentences': examples_str,
+        'pitch_accent': pitch_html,
+        'kanji_info': kanji_info_str,
+    })
     if preview_only:
-        # For preview, use the actual values, not field names
-        return front_template.replace('{{word}}', word).replace('{{reading}}', reading).replace('{{meanings}}', meanings_str).replace('{{example sentences}}', examples_str).replace('{{pitch_accent}}', pitch_html).replace('{{kanji_info}}', kanji_info_str)
+        return card_html
     # Create note in Anki
     model_name = 'JapaneseWordAuto'
     mm = mw.col.models
@@ -400,6 +154,22 @@ def create_japanese_word_card(word, deck_id=None, preview_only=False):
         model['css'] = card_css
         mm.addTemplate(model, tmpl)
         mm.add(model)
+    else:
+        # Note types added while the template paths were wrong got empty
+        # templates and CSS, without the pitch data script or the styles
+        # the compact diagrams depend on
+        changed = False
+        if not model['css'].strip():
+            model['css'] = card_css
+            changed = True
+        for tmpl in model['tmpls']:
+            if not tmpl['qfmt'].strip() and not tmpl['afmt'].strip():
+                tmpl['qfmt'] = front_template
+                tmpl['afmt'] = back_template
+                changed = True
+        if changed:
+            mm.save(model)
+    check_field_format(model)
     note = Note(mw.col, model)
     note['word'] = word
     note['reading'] = reading
@@ -413,7 +183,7 @@ def create_japanese_word_card(word, deck_id=None, preview_only=False):
     mw.reset()
     # Removed showInfo popup
     # showInfo(f"Japanese word card created for: {word}")
-    return front_template.replace('{{word}}', word).replace('{{reading}}', reading).replace('{{meanings}}', meanings_str).replace('{{example sentences}}', examples_str).replace('{{pitch_accent}}', pitch_html).replace('{{kanji_info}}', kanji_info_str)
+    return card_html
 
 def format_pitch_pattern(pattern):
     """Convert a pitch pattern (e.g., 'LHHLL') into a standardized pattern."""
@@ -475,22 +245,20 @@ def on_main_menu_add():
     _menu_entry_added = True
 
 addHook("profileLoaded", on_main_menu_add)
+# Build missing/outdated data DBs in the background once the profile is up
+addHook("profileLoaded", start_first_run_build)
 
-# --- Utility to load external template and CSS files ---
-def load_file_text(path):
-    try:
-        with open(path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception:
-        return ''
-
-FRONT_TEMPLATE_PATH = os.path.join(ADDON_DIR, 'front_card.html')
-BACK_TEMPLATE_PATH = os.path.join(ADDON_DIR, 'back_card.html')
-CSS_PATH = os.path.join(ADDON_DIR, 'css_card.css')
+# --- External template and CSS files (card_templates/review) ---
+@once
+def card_templates():
+    # (front, back, css), read when the first card is created
+    return read_review_templates()
 
-front_template = load_file_text(FRONT_TEMPLATE_PATH)
-back_template = load_file_text(BACK_TEMPLATE_PATH)
-card_css = load_file_text(CSS_PATH)
+@once
+def compiled_card_templates():
+    # (front, back) split into literal and field segments once, for previews
+    front_template, back_template, _card_css = card_templates()
+    return compile_template(front_template), compile_template(back_template)
 
 # --- Runtime Diagnostics: Measure timings for major functions ---
 if __name__ == "__main__":
@@ -528,17 +296,14 @@ def _test_lookup_pitch_accent_for_kanji():
     print("\n--- Pitch Accent Lookup Test for '生' ---")
     results = []
     ensure_pitchdb_sqlite()
-    import sqlite3
     if not os.path.exists(PITCH_DB_SQLITE_PATH):
         print("Pitch DB not found.")
         return
-    conn = sqlite3.connect(PITCH_DB_SQLITE_PATH)
-    c = conn.cursor()
+    c = get_connection(PITCH_DB_SQLITE_PATH).cursor()
     c.execute('SELECT kana, accented_kana, pitch_number, pattern FROM pitch_accents WHERE kanji=?', ('生',))
     for row in c.fetchall():
         kana, accented_kana, pitch_number, pattern = row
         results.append((kana, accented_kana, pitch_number, pattern))
-    conn.close()
     if not results:
         print("No results found for '生'.")
     else:
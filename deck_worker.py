@@ -0,0 +1,141 @@
+# deck_worker.py
+# Runs the work of the deck tools (pitch accents, word translations,
+# related-word sorting) off the Qt main thread. A tool's work function
+# reads the deck and prepares the changed notes in a QueryOp, reporting
+# progress a few times a second and stopping early when Cancel is
+# pressed; the notes are then written with a single col.update_notes in a
+# CollectionOp, so a cancelled run changes nothing, a finished one is one
+# undo entry, and Anki refreshes its screens from the op's changes.
+import threading
+import time
+from aqt import mw
+from aqt.operations import CollectionOp, QueryOp
+from aqt.qt import QDialog
+from aqt.utils import showInfo
+
+# Seconds between progress updates sent to the dialog
+PROGRESS_INTERVAL = 0.25
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class DeckJob:
+    """
+    State of one run of a tool's work(col, report). work calls report(done,
+    total) as it goes; the call raises JobCancelled once cancel() was called
+    and only forwards progress to on_progress (on the main thread) every
+    PROGRESS_INTERVAL seconds, so it is cheap to call per note.
+    """
+
+    def __init__(self, work, on_progress):
+        self.work = work
+        self.on_progress = on_progress
+        self._cancelled = threading.Event()
+        self._reported = 0.0
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def report(self, done, total):
+        if self._cancelled.is_set():
+            raise JobCancelled()
+        now = time.monotonic()
+        if done >= total or now - self._reported >= PROGRESS_INTERVAL:
+            self._reported = now
+            mw.taskman.run_on_main(lambda: self.on_progress(self, done, total))
+
+    def run(self, col):
+        # Runs in the QueryOp's background thread
+        return self.work(col, self.report)
+
+
+class DeckJobDialog(QDialog):
+    """
+    Base of the deck tool dialogs. run_job runs a tool's work on a DeckJob
+    with self.progress (a 0-100 QProgressBar) showing how far it got; the
+    Cancel button (self.cancel_btn, connected to cancel) stops a running
+    job and only closes the dialog when nothing is running.
+    """
+    job = None
+
+    def run_job(self, work, done):
+        """
+        Run work(col, report) in the background. Its notes are saved in a
+        CollectionOp when it finishes, then done(count) is called with the
+        number of notes saved and the dialog is accepted.
+        """
+        job = DeckJob(work, self._on_progress)
+        self.job = job
+        self.ok_btn.setEnabled(False)
+        self.progress.setValue(0)
+        QueryOp(
+            parent=self,
+            op=job.run,
+            success=lambda notes: self._on_prepared(job, notes, done),
+        ).failure(lambda error: self._on_failed(job, error)).run_in_background()
+
+    def _on_progress(self, job, done, total):
+        if job is self.job:
+            self.progress.setValue(int(done / total * 100) if total else 100)
+
+    def _job_ended(self, job):
+        # False for a job that was cancelled by closing the dialog
+        if job is not self.job:
+            return False
+        self.job = None
+        self.ok_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(True)
+        return True
+
+    def _on_failed(self, job, error):
+        if not self._job_ended(job):
+            return
+        self.progress.setValue(0)
+        if isinstance(error, JobCancelled):
+            showInfo("Cancelled; no notes were changed.")
+        else:
+            showInfo(f"Failed: {error}")
+
+    def _on_prepared(self, job, notes, done):
+        if job is not self.job:
+            return
+        if job.cancelled():
+            # Cancel was pressed after the last report; drop the notes
+            self._on_failed(job, JobCancelled())
+            return
+        if not notes:
+            self._on_saved(job, 0, done)
+            return
+        self.cancel_btn.setEnabled(False)
+        CollectionOp(
+            parent=self,
+            op=lambda col: col.update_notes(notes),
+        ).success(lambda changes: self._on_saved(job, len(notes), done)).failure(
+            lambda error: self._on_failed(job, error)).run_in_background()
+
+    def _on_saved(self, job, count, done):
+        if not self._job_ended(job):
+            return
+        self.progress.setValue(100)
+        done(count)
+        QDialog.accept(self)
+
+    def cancel(self):
+        if self.job is None:
+            self.reject()
+            return
+        self.cancel_btn.setEnabled(False)
+        self.job.cancel()
+
+    def reject(self):
+        # Closing the dialog while the notes are being prepared drops them
+        # unsaved; the job stops at its next report, without being waited for
+        job, self.job = self.job, None
+        if job is not None:
+            job.cancel()
+        super().reject()
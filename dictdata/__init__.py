@@ -0,0 +1,23 @@
+# dictdata
+# Qt-free data layer of the add-on: the dictionary datasets (pitch accents,
+# JMdict, kanji info, word frequencies, example sentences), the SQLite
+# builders and pooled connections behind them and the shared LRU caches.
+# The card creator, the lookup dialog and the deck tools all go through
+# this package, so a word looked up by one of them is a cache hit for the
+# others. Importing it is cheap; datasets load on first use.
+from .paths import (
+    ADDON_DIR, DATA_DIR, JM_DICT_PATH, JMDICT_JSON_PATH, JMDICT_SQLITE_PATH,
+    PITCH_DB_PATH, PITCH_DB_SQLITE_PATH, KANJI_INFO_PATH, FREQ_SQLITE_PATH,
+    EXAMPLES_DB_PATH, EXAMPLES_JSON_PATH)
+from .lookups import (
+    ensure_pitchdb_sqlite, ensure_jmdict_sqlite,
+    lookup_pitch_entries, lookup_pitch_entries_many, lookup_pitch_accent, lookup_pitch_accent_many,
+    lookup_jmdict, lookup_jmdict_many, jmdict_db_is_complete,
+    kanji_info_index, get_kanji_info_blocks,
+    get_word_frequency, get_word_frequency_many, get_reading_frequencies,
+    lookup_sentences_and_related, get_example_sentences, get_local_examples,
+    WordInfo, get_word_info)
+from .db_pool import get_connection, close_all, pause_pool
+from .lookup_cache import get_cache, invalidate, cache_stats
+from .dictdb import defer_builds, katakana_reading
+from .lazy import once
@@ -0,0 +1,152 @@
+# bloom.py
+# Bloom filters over the lookup keys of the dictionary DBs, stored next to
+# each DB (wadoku_pitchdb.bloom for wadoku_pitchdb.sqlite, ...) and read
+# through an mmap. A word the filter does not contain is definitely not in
+# the DB, so most misses (particles, inflected forms, whole phrases) are
+# answered without a SQLite query. A filter records the size and mtime of
+# the DB it was built from and is ignored once the DB has changed.
+import hashlib
+import math
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b'JWCBLOOM'
+VERSION = 1
+# magic, version, hash count, bit count, key count, DB size, DB mtime_ns
+_HEADER = struct.Struct('<8sHHQQQq')
+
+# Target false-positive rate of newly built filters
+DEFAULT_ERROR_RATE = 0.01
+
+# Blocked layout: a key's bits all fall in one 64-bit word, so a lookup
+# is one hash and one 8-byte read instead of a read per bit.
+HASHES = 7
+# Blocked filters need a little more room than classic ones for the same rate
+_BLOCK_OVERHEAD = 1.25
+# (1 << a) | (1 << b) for every 12-bit pair of bit positions a, b
+_PAIR_MASKS = tuple((1 << (x & 63)) | (1 << (x >> 6)) for x in range(4096))
+_BLOCK = struct.Struct('<Q')
+
+
+# Windows refuses to replace a file that is still open elsewhere (a
+# lookup that has just opened it); retry for about five seconds
+REPLACE_ATTEMPTS = 50
+REPLACE_DELAY = 0.1
+
+
+def replace_file(src, dst):
+    """os.replace, retried while dst is briefly held open by another process."""
+    for attempt in range(REPLACE_ATTEMPTS):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == REPLACE_ATTEMPTS - 1:
+                raise
+            time.sleep(REPLACE_DELAY)
+
+
+def bloom_path(db_path):
+    """Path of the filter built for the DB at db_path."""
+    return os.path.splitext(db_path)[0] + '.bloom'
+
+
+def db_signature(db_path):
+    st = os.stat(db_path)
+    return st.st_size, st.st_mtime_ns
+
+
+def filter_size(key_count, error_rate=DEFAULT_ERROR_RATE):
+    """Bit count (a whole number of 64-bit blocks) for key_count keys at the given rate."""
+    key_count = max(key_count, 1)
+    bits = -key_count * math.log(error_rate) / (math.log(2) ** 2) * _BLOCK_OVERHEAD
+    return max(1, int(math.ceil(bits / 64))) * 64
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _block_and_mask(h, blocks):
+    # Low 42 bits pick the 7 bit positions, the rest picks the block
+    mask = _PAIR_MASKS[h & 4095] | _PAIR_MASKS[(h >> 12) & 4095] | _PAIR_MASKS[(h >> 24) & 4095] | (1 << ((h >> 36) & 63))
+    return (h >> 42) % blocks, mask
+
+
+def build_bloom(keys, key_count, path, signature=(0, 0), error_rate=DEFAULT_ERROR_RATE):
+    """
+    Write a filter holding every key of the iterable keys (key_count is used
+    for sizing) to path, via a temp file renamed into place. signature is
+    the (size, mtime_ns) of the DB the keys were read from.
+    """
+    bits = filter_size(key_count, error_rate)
+    blocks = [0] * (bits // 64)
+    count = 0
+    for key in keys:
+        if not key:
+            continue
+        block, mask = _block_and_mask(_hash(key), len(blocks))
+        blocks[block] |= mask
+        count += 1
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, HASHES, bits, count, signature[0], signature[1]))
+        f.write(struct.pack('<{}Q'.format(len(blocks)), *blocks))
+    replace_file(tmp, path)
+    return count
+
+
+def read_header(path):
+    """Return (hashes, bits, count, signature) of the filter at path, or None."""
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(raw) != _HEADER.size:
+        return None
+    magic, version, hashes, bits, count, size, mtime_ns = _HEADER.unpack(raw)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return hashes, bits, count, (size, mtime_ns)
+
+
+def is_current(path, db_path):
+    """True if the filter at path was built from the DB as it is now."""
+    header = read_header(path)
+    try:
+        return header is not None and header[3] == db_signature(db_path)
+    except OSError:
+        return False
+
+
+class BloomFilter:
+    """Read-only view of a filter file; `key in bloom` is False only for absent keys."""
+
+    def __init__(self, path):
+        header = read_header(path)
+        if header is None:
+            raise ValueError('not a bloom filter: {}'.format(path))
+        self.hashes, self.bits, self.count, self.signature = header
+        self._blocks = self.bits // 64
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __contains__(self, key):
+        block, mask = _block_and_mask(_hash(key), self._blocks)
+        return _BLOCK.unpack_from(self._map, _HEADER.size + block * 8)[0] & mask == mask
+
+    def close(self):
+        self._map.close()
+
+
+def measure_false_positive_rate(bloom, absent_keys):
+    """Share of absent_keys (keys known not to be in the DB) the filter lets through."""
+    total = hits = 0
+    for key in absent_keys:
+        total += 1
+        if key in bloom:
+            hits += 1
+    return hits / total if total else 0.0
@@ -0,0 +1,143 @@
+# build_worker.py
+# First-run data build, run in a separate process so the Anki main thread
+# never blocks on the XML/CSV conversion. Builds whatever is missing or
+# outdated (pitch DB and its aligned patterns, JMdict DB, frequency tables, bloom filters) and reports progress as
+# one JSON object per line on stdout:
+#   {"event": "start", "steps": [...]}
+#   {"event": "progress", "step": "jmdict", "rows": 120000}
+#   {"event": "done", "step": "jmdict", "rows": ..., "seconds": ...}
+#   {"event": "error", "step": "jmdict", "message": "..."}
+#   {"event": "finished"}
+# Any other line (e.g. dictdb's build report) should be ignored.
+# Qt-free; run as `python -m dictdata.build_worker` from the add-on
+# directory. The add-on can also run run_builds in a thread as a fallback.
+import json
+import os
+import sys
+from . import dictdb
+from . import paths
+
+# Address-space cap for the worker process, where the OS supports it
+MEMORY_LIMIT_MB = 1024
+
+
+def _paths(data_dir=None):
+    # The add-on's data files, optionally relocated to another directory
+    def path(default):
+        return os.path.join(data_dir, os.path.basename(default)) if data_dir else default
+    return {
+        'pitch_csv': path(paths.PITCH_DB_PATH),
+        'pitch_db': path(paths.PITCH_DB_SQLITE_PATH),
+        'jmdict_xml': path(paths.JM_DICT_PATH),
+        'jmdict_json': path(paths.JMDICT_JSON_PATH),
+        'jmdict_db': path(paths.JMDICT_SQLITE_PATH),
+        'frequency_db': path(paths.FREQ_SQLITE_PATH),
+    }
+
+
+def _steps(data_dir=None):
+    # (name, needs_build, build(progress))
+    p = _paths(data_dir)
+    return [
+        ('pitch',
+         lambda: dictdb.pitch_db_needs_build(p['pitch_csv'], p['pitch_db']),
+         lambda progress: dictdb.build_pitch_db(p['pitch_csv'], p['pitch_db'], progress=progress)),
+        ('pitch_patterns',
+         lambda: dictdb.pitch_tables_need_build(p['pitch_db']),
+         lambda progress: dictdb.build_pitch_tables(p['pitch_db'])),
+        ('jmdict',
+         lambda: dictdb.jmdict_db_needs_build(p['jmdict_xml'], p['jmdict_json'], p['jmdict_db']),
+         lambda progress: dictdb.build_jmdict_db_from_source(
+             p['jmdict_xml'], p['jmdict_json'], p['jmdict_db'], progress=progress)),
+        ('frequency',
+         lambda: dictdb.frequency_db_needs_build(p['frequency_db']),
+         lambda progress: dictdb.build_frequency_tables(p['frequency_db'])),
+        ('filters',
+         lambda: bool(_stale_filters(p)),
+         lambda progress: _build_filters(p, progress)),
+    ]
+
+
+def _stale_filters(p):
+    # Bloom filters of DBs that are otherwise current; a rebuilt DB gets a
+    # new filter as part of its own step
+    filters = [
+        (p['pitch_db'], dictdb.PITCH_KEYS_SQL,
+         dictdb.pitch_db_needs_build(p['pitch_csv'], p['pitch_db']) or dictdb.pitch_tables_need_build(p['pitch_db'])),
+        (p['jmdict_db'], dictdb.JMDICT_KEYS_SQL,
+         dictdb.jmdict_db_needs_build(p['jmdict_xml'], p['jmdict_json'], p['jmdict_db'])),
+        (p['frequency_db'], dictdb.FREQUENCY_KEYS_SQL, dictdb.frequency_db_needs_build(p['frequency_db'])),
+    ]
+    return [(db, sql) for db, sql, rebuilt in filters if not rebuilt and dictdb.key_filter_needs_build(db)]
+
+
+def _build_filters(p, progress=None):
+    rows = 0
+    seconds = 0
+    for db_path, keys_sql in _stale_filters(p):
+        stats = dictdb.build_key_filter(db_path, keys_sql)
+        rows += stats['rows']
+        seconds += stats['seconds']
+        if progress:
+            progress(rows)
+    return {'rows': rows, 'seconds': seconds}
+
+
+def pending_steps(data_dir=None):
+    """Names of the build steps that still have to run."""
+    return [name for name, needs_build, _build in _steps(data_dir) if needs_build()]
+
+
+def run_builds(emit, data_dir=None):
+    """
+    Run every pending build step, calling emit(event_dict) for progress.
+    Returns True if all steps succeeded.
+    """
+    steps = [(name, build) for name, needs_build, build in _steps(data_dir) if needs_build()]
+    emit({'event': 'start', 'steps': [name for name, _build in steps]})
+    ok = True
+    for name, build in steps:
+        try:
+            stats = build(lambda rows, name=name: emit({'event': 'progress', 'step': name, 'rows': rows}))
+            stats = stats or {}
+            emit({'event': 'done', 'step': name, 'rows': stats.get('rows', 0), 'seconds': stats.get('seconds', 0)})
+        except Exception as e:
+            ok = False
+            emit({'event': 'error', 'step': name, 'message': str(e)})
+    emit({'event': 'finished'})
+    return ok
+
+
+def limit_memory(megabytes=MEMORY_LIMIT_MB):
+    try:
+        import resource
+    except ImportError:  # Windows
+        return
+    limit = megabytes * 1024 * 1024
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _emit_line(event):
+    sys.stdout.write(json.dumps(event, ensure_ascii=False) + '\n')
+    sys.stdout.flush()
+
+
+def main(argv):
+    megabytes = MEMORY_LIMIT_MB
+    data_dir = None
+    if '--memory-mb' in argv:
+        megabytes = int(argv[argv.index('--memory-mb') + 1])
+    if '--data-dir' in argv:
+        data_dir = argv[argv.index('--data-dir') + 1]
+    limit_memory(megabytes)
+    return 0 if run_builds(_emit_line, data_dir) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
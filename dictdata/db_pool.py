@@ -0,0 +1,116 @@
+# db_pool.py
+# Persistent read-only SQLite connections for the dictionary lookups.
+# Each thread gets one connection per database, opened on first use and
+# kept for the rest of the session so the schema and page cache survive
+# between words. The bloom filters next to the DBs are mapped here too,
+# once per process. close_all() may be called from any thread: it only
+# marks the pool stale, and every thread closes its own connections the
+# next time it asks for one.
+import os
+import sqlite3
+import threading
+from urllib.request import pathname2url
+from .bloom import BloomFilter, bloom_path, is_current
+
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 16 * 1024
+# Lookups use module-level SQL constants, so sqlite3's per-connection
+# statement cache prepares each query once per connection.
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+_lock = threading.Lock()
+_generation = 0
+_paused = False
+# db path -> BloomFilter, or None if the DB has no current filter
+_filters = {}
+_NOT_LOADED = object()
+
+
+def _open_readonly(path):
+    uri = 'file:{}?mode=ro&immutable=1'.format(pathname2url(os.path.abspath(path)))
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+    conn.execute('PRAGMA mmap_size={}'.format(MMAP_SIZE))
+    conn.execute('PRAGMA cache_size=-{}'.format(CACHE_SIZE_KIB))
+    return conn
+
+
+def _close_local():
+    # Close the calling thread's connections
+    conns = getattr(_local, 'conns', None)
+    _local.conns = {}
+    _local.generation = _generation
+    for conn in (conns or {}).values():
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def get_connection(path):
+    """
+    Return the calling thread's read-only connection to the database at path.
+    Raises sqlite3.OperationalError if the file cannot be opened.
+    """
+    if _paused:
+        # Not kept: the caller's reference is the only one, so the file is
+        # closed again as soon as the lookup is done with it
+        return _open_readonly(path)
+    if getattr(_local, 'conns', None) is None or _local.generation != _generation:
+        _close_local()
+    conns = _local.conns
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _open_readonly(path)
+    return conn
+
+
+def close_all():
+    """
+    Drop every pooled connection and bloom filter. Must be called before a
+    database file is replaced, since connections are opened as immutable.
+    The calling thread's connections are closed right away; other threads
+    close theirs on their next get_connection, and a dropped filter is
+    unmapped once no lookup holds it any more.
+    """
+    global _generation
+    with _lock:
+        _generation += 1
+        _filters.clear()
+    _close_local()
+
+
+def pause_pool(paused=True):
+    """
+    While paused, as when a build in another thread or process is about to
+    replace the DB files, connections are closed after each use and no
+    filters are mapped, so the files are not held open (which would make
+    replacing them fail on Windows). Pausing drops the pool.
+    """
+    global _paused
+    _paused = paused
+    close_all()
+
+
+def get_key_filter(db_path):
+    """
+    Return the bloom filter of the DB at db_path, or None if it has none or
+    the filter is stale. The result is kept until close_all().
+    """
+    if _paused:
+        return None
+    bloom = _filters.get(db_path, _NOT_LOADED)
+    if bloom is not _NOT_LOADED:
+        return bloom
+    with _lock:
+        if db_path in _filters:
+            return _filters[db_path]
+        path = bloom_path(db_path)
+        bloom = None
+        try:
+            if is_current(path, db_path):
+                bloom = BloomFilter(path)
+        except Exception:
+            bloom = None
+        _filters[db_path] = bloom
+        return bloom
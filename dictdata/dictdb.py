@@ -0,0 +1,873 @@
+# dictdb.py
+# Shared SQLite builders and queries for the dictionary databases used by
+# the add-on. Qt-free so it can be used from tests and command-line
+# scripts as well.
+import json
+import os
+import re
+import shutil
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from itertools import islice
+from urllib.request import pathname2url
+from .bloom import bloom_path, build_bloom, db_signature, is_current, replace_file
+from .db_pool import close_all
+from .lookup_cache import invalidate
+from .mora import MISALIGNED, pitch_heights, to_mora
+
+# Characters wadoku uses to mark irregular/rare spellings
+_WADOKU_MARKS = re.compile(r'[△×…]')
+_WADOKU_HEADER = 'kanji␞kana␞'
+
+BUILD_BATCH_SIZE = 10000
+
+# Set while a background build owns the data files; the ensure_* helpers
+# then leave building to it and lookups make do with what exists. The
+# thread that deferred the builds drops the pool and cached lookups once
+# they are done, so a build running in another thread leaves them alone.
+_builds_deferred = False
+
+
+def defer_builds(deferred=True):
+    global _builds_deferred
+    _builds_deferred = deferred
+
+
+def _batches(rows, size):
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _tmp_path(db_path):
+    return db_path + '.tmp'
+
+
+def _open_build_db(db_path):
+    """
+    Open a fresh temp database next to db_path for a bulk build.
+    Journaling and fsync are off: the file is only renamed into place once
+    the build has fully committed, so a crash just leaves a stale temp file.
+    """
+    tmp = _tmp_path(db_path)
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn, tmp
+
+
+def _finish_build_db(conn, tmp, db_path):
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    if not _builds_deferred:
+        # Pooled connections are immutable and would keep the old file open
+        close_all()
+    replace_file(tmp, db_path)
+    if not _builds_deferred:
+        # Cached lookups (including cached misses) describe the old data
+        invalidate()
+
+
+def _abort_build_db(conn, tmp):
+    try:
+        conn.close()
+    except Exception:
+        pass
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+
+def _build_stats(rows, started):
+    seconds = time.perf_counter() - started
+    return {
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds > 0 else float(rows),
+    }
+
+
+def report_build(name, stats):
+    print("[dictdb] built {}: {} rows in {:.2f}s ({:.0f} rows/s)".format(
+        name, stats['rows'], stats['seconds'], stats['rows_per_sec']))
+    if stats.get('misaligned'):
+        print("[dictdb] {}: {} pitch patterns do not fit their reading "
+              "(dictdb.misaligned_pitch_patterns lists them)".format(name, stats['misaligned']))
+
+
+# --- Key filters (see bloom.py) ---
+# Every key a lookup can match, per DB
+PITCH_KEYS_SQL = 'SELECT kanji FROM pitch_accents UNION SELECT kana FROM pitch_accents'
+JMDICT_KEYS_SQL = 'SELECT DISTINCT key FROM entry_key'
+FREQUENCY_KEYS_SQL = 'SELECT DISTINCT word FROM word_readings'
+
+_key_filters_checked = set()
+
+
+def build_key_filter(db_path, keys_sql):
+    """Build the bloom filter of db_path from the keys keys_sql selects. Returns a stats dict."""
+    started = time.perf_counter()
+    signature = db_signature(db_path)
+    uri = 'file:{}?mode=ro'.format(pathname2url(os.path.abspath(db_path)))
+    conn = sqlite3.connect(uri, uri=True)
+    try:
+        count = conn.execute('SELECT count(*) FROM ({})'.format(keys_sql)).fetchone()[0]
+        if not _builds_deferred:
+            # The old filter may still be mapped by the pool
+            close_all()
+        rows = build_bloom((row[0] for row in conn.execute(keys_sql)), count, bloom_path(db_path), signature)
+    finally:
+        conn.close()
+    return _build_stats(rows, started)
+
+
+def key_filter_needs_build(db_path):
+    return os.path.exists(db_path) and not is_current(bloom_path(db_path), db_path)
+
+
+def ensure_key_filter(db_path, keys_sql):
+    """Build db_path's bloom filter once per session if it is missing or stale."""
+    if _builds_deferred or db_path in _key_filters_checked:
+        return
+    _key_filters_checked.add(db_path)
+    if not key_filter_needs_build(db_path):
+        return
+    try:
+        report_build(os.path.basename(bloom_path(db_path)), build_key_filter(db_path, keys_sql))
+    except Exception:
+        pass
+
+
+# --- Wadoku pitch accent DB ---
+def iter_pitch_rows(csv_path):
+    """
+    Stream (kanji, kana, accented_kana, pitch_number, pattern) rows from
+    wadoku_pitchdb.csv, one row per kanji x kana spelling.
+    """
+    # utf-8-sig drops the byte order mark the export starts with
+    with open(csv_path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            if not line.strip() or line.startswith(_WADOKU_HEADER):
+                continue
+            parts = line.strip().split('␞')
+            if len(parts) < 5:
+                continue
+            kanji_column, kana_column, accented_kana, pitch_number, pitch_pattern = parts[:5]
+            kanji_list = [_WADOKU_MARKS.sub('', k) for k in kanji_column.split('␟') if k]
+            kana_list = [_WADOKU_MARKS.sub('', k) for k in kana_column.split('␟') if k]
+            for kanji in kanji_list or ['']:
+                for kana in kana_list or ['']:
+                    yield (kanji, kana, accented_kana, pitch_number, pitch_pattern)
+
+
+# Bumped whenever the pitch DB schema changes; older DBs are upgraded.
+# 1 added pitch_pattern, the patterns pre-aligned to their reading's mora.
+PITCH_SCHEMA_VERSION = 1
+
+PITCH_PATTERN_SCHEMA = (
+    # One row per comma-separated pattern of a pitch_accents row: the
+    # normalized hiragana reading, its mora separated by spaces, the pattern
+    # as one H/L per mora plus the particle, the matching accent number
+    # (NULL if wadoku gives none) and how the pattern was fitted (see
+    # mora.align_pattern)
+    'CREATE TABLE pitch_pattern (accent_id INTEGER, pos INTEGER, hira TEXT, mora TEXT, '
+    'heights TEXT, pitch_number INTEGER, alignment TEXT, PRIMARY KEY (accent_id, pos)) WITHOUT ROWID',
+)
+
+
+def _pitch_number(numbers, pos):
+    number = numbers[pos].strip() if pos < len(numbers) else ''
+    return int(number) if number.isdigit() else None
+
+
+def _pitch_pattern_rows(rows):
+    # rows: (id, kana, pitch_number, pattern) of pitch_accents
+    split = {}
+    for accent_id, kana, pitch_number, pattern in rows:
+        patterns = [p.strip() for p in (pattern or '').split(',') if p.strip()]
+        if not patterns:
+            continue
+        kana = kana or ''
+        mora = split.get(kana)
+        if mora is None:
+            mora = split[kana] = to_mora(kana)
+        numbers = (pitch_number or '').split(',')
+        for pos, patt in enumerate(patterns):
+            heights, alignment = pitch_heights(mora, patt)
+            yield (accent_id, pos, ''.join(mora), ' '.join(mora), heights,
+                   _pitch_number(numbers, pos), alignment)
+
+
+def _fill_pitch_patterns(conn, batch_size=BUILD_BATCH_SIZE):
+    """(Re)create pitch_pattern from pitch_accents; returns the number of misaligned rows."""
+    conn.execute('DROP TABLE IF EXISTS pitch_pattern')
+    for sql in PITCH_PATTERN_SCHEMA:
+        conn.execute(sql)
+    accents = conn.execute('SELECT id, kana, pitch_number, pattern FROM pitch_accents ORDER BY id')
+    for batch in _batches(_pitch_pattern_rows(accents), batch_size):
+        conn.executemany('INSERT INTO pitch_pattern VALUES (?, ?, ?, ?, ?, ?, ?)', batch)
+    conn.execute('PRAGMA user_version={}'.format(PITCH_SCHEMA_VERSION))
+    return conn.execute(
+        'SELECT count(*) FROM pitch_pattern WHERE alignment IN (SELECT value FROM json_each(?))',
+        (json.dumps(MISALIGNED),)).fetchone()[0]
+
+
+def build_pitch_db(csv_path, db_path, batch_size=BUILD_BATCH_SIZE, progress=None):
+    """
+    Build wadoku_pitchdb.sqlite from the wadoku CSV in a single transaction.
+    Rows are bulk-inserted with executemany, indexes are created after the
+    load, pitch_pattern is derived from the loaded rows, and the result is
+    written to a temp file and atomically renamed over db_path. progress,
+    if given, is called with the row count after every batch. Returns a
+    stats dict (rows, seconds, rows_per_sec, misaligned).
+    """
+    started = time.perf_counter()
+    conn, tmp = _open_build_db(db_path)
+    try:
+        conn.execute('''CREATE TABLE pitch_accents (
+            id INTEGER PRIMARY KEY,
+            kanji TEXT,
+            kana TEXT,
+            accented_kana TEXT,
+            pitch_number TEXT,
+            pattern TEXT
+        )''')
+        rows = 0
+        for batch in _batches(iter_pitch_rows(csv_path), batch_size):
+            conn.executemany('INSERT INTO pitch_accents (kanji, kana, accented_kana, pitch_number, pattern) VALUES (?, ?, ?, ?, ?)', batch)
+            rows += len(batch)
+            if progress:
+                progress(rows)
+        conn.execute('CREATE INDEX idx_pitch_kanji ON pitch_accents(kanji)')
+        conn.execute('CREATE INDEX idx_pitch_kana ON pitch_accents(kana)')
+        misaligned = _fill_pitch_patterns(conn, batch_size)
+        _finish_build_db(conn, tmp, db_path)
+    except BaseException:
+        _abort_build_db(conn, tmp)
+        raise
+    build_key_filter(db_path, PITCH_KEYS_SQL)
+    return dict(_build_stats(rows, started), misaligned=misaligned)
+
+
+def build_pitch_tables(db_path):
+    """
+    Add pitch_pattern to a wadoku_pitchdb.sqlite built before it existed,
+    on a temp copy that is renamed over db_path. Needs no CSV. Returns a
+    stats dict (rows being the pitch_pattern rows, misaligned).
+    """
+    started = time.perf_counter()
+    tmp = _tmp_path(db_path)
+    shutil.copyfile(db_path, tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        misaligned = _fill_pitch_patterns(conn)
+        rows = conn.execute('SELECT count(*) FROM pitch_pattern').fetchone()[0]
+        _finish_build_db(conn, tmp, db_path)
+    except BaseException:
+        _abort_build_db(conn, tmp)
+        raise
+    build_key_filter(db_path, PITCH_KEYS_SQL)
+    return dict(_build_stats(rows, started), misaligned=misaligned)
+
+
+def pitch_db_needs_build(csv_path, db_path):
+    return not os.path.exists(db_path) and os.path.exists(csv_path)
+
+
+def pitch_tables_need_build(db_path):
+    try:
+        return os.path.exists(db_path) and _schema_version(db_path) < PITCH_SCHEMA_VERSION
+    except Exception:
+        return False
+
+
+_pitch_dbs_checked = set()
+
+
+def ensure_pitch_db(csv_path, db_path):
+    """Build the pitch accent DB from the CSV if it does not exist yet, or add pitch_pattern once if it predates it."""
+    if _builds_deferred:
+        return
+    if pitch_db_needs_build(csv_path, db_path):
+        try:
+            report_build(os.path.basename(db_path), build_pitch_db(csv_path, db_path))
+        except Exception:
+            pass
+    elif db_path not in _pitch_dbs_checked:
+        _pitch_dbs_checked.add(db_path)
+        if pitch_tables_need_build(db_path):
+            try:
+                report_build(os.path.basename(db_path) + ' pitch patterns', build_pitch_tables(db_path))
+            except Exception:
+                pass
+    ensure_key_filter(db_path, PITCH_KEYS_SQL)
+
+
+_MISALIGNED_SQL = (
+    'SELECT a.kanji, a.kana, a.pattern, p.pos, p.heights, p.alignment '
+    'FROM pitch_pattern p JOIN pitch_accents a ON a.id = p.accent_id '
+    'WHERE p.alignment IN (SELECT value FROM json_each(?)) ORDER BY p.accent_id, p.pos'
+)
+
+
+def misaligned_pitch_patterns(conn):
+    """
+    The pitch_pattern rows whose wadoku pattern does not fit the reading's
+    mora, as (kanji, kana, wadoku pattern, pattern position, drawn heights,
+    alignment) tuples in DB order; alignment is 'padded' or 'truncated'.
+    """
+    return conn.execute(_MISALIGNED_SQL, (json.dumps(MISALIGNED),)).fetchall()
+
+
+def _is_single_kanji(word):
+    return len(word) == 1 and '\u4e00' <= word <= '\u9fff'
+
+
+def _pitch_entry(row):
+    return {'kana': row[1], 'accented_kana': row[2], 'pitch_number': row[3], 'pattern': row[4]}
+
+
+_PITCH_SQL = 'SELECT kanji, kana, accented_kana, pitch_number, pattern FROM pitch_accents '
+# pitch_accents rows with their pitch_pattern rows, one result row per pattern
+_PITCH_ALIGNED_SQL = (
+    'SELECT a.kanji, a.kana, a.accented_kana, a.pitch_number, a.pattern, a.id, '
+    'p.hira, p.mora, p.heights, p.pitch_number '
+    'FROM pitch_accents a LEFT JOIN pitch_pattern p ON p.accent_id = a.id '
+)
+
+
+def _pitch_rows(conn, where, params):
+    """
+    (kanji, kana, entry) for the pitch_accents rows matching where, in
+    table order. Entries of a DB with pitch_pattern carry 'aligned', a
+    tuple of (hiragana, mora, heights, accent number) per pattern, ready
+    to draw; entries of older DBs only have the raw wadoku columns.
+    """
+    try:
+        rows = conn.execute(_PITCH_ALIGNED_SQL + where.format(a='a.') + ' ORDER BY a.id, p.pos', params).fetchall()
+    except sqlite3.OperationalError:
+        return [(row[0], row[1], _pitch_entry(row))
+                for row in conn.execute(_PITCH_SQL + where.format(a='') + ' ORDER BY id', params)]
+    result = []
+    last_id = None
+    for row in rows:
+        if row[5] != last_id:
+            last_id = row[5]
+            entry = _pitch_entry(row)
+            entry['aligned'] = ()
+            result.append((row[0], row[1], entry))
+        if row[6] is not None:
+            entry['aligned'] += ((row[6], tuple(row[7].split()), row[8], row[9]),)
+    return result
+
+
+def pitch_entries(conn, word):
+    """
+    Return the pitch_accents rows for word as dicts, in table order.
+    A single kanji only matches the kanji column, so all its readings are
+    returned; anything else matches either the kanji or the kana column.
+    """
+    if _is_single_kanji(word):
+        rows = _pitch_rows(conn, 'WHERE {a}kanji=?', (word,))
+    else:
+        rows = _pitch_rows(conn, 'WHERE {a}kanji=? OR {a}kana=?', (word, word))
+    return [entry for _kanji, _kana, entry in rows]
+
+
+_PITCH_MANY_WHERE = (
+    'WHERE {a}kanji IN (SELECT value FROM json_each(?)) OR {a}kana IN (SELECT value FROM json_each(?))'
+)
+
+
+def pitch_entries_many(conn, words):
+    """
+    Batched pitch_entries: one query for all words, returning
+    {word: [entry, ...]} with the same rows and order as the single lookup.
+    """
+    words = list(dict.fromkeys(words))
+    result = {word: [] for word in words}
+    if not words:
+        return result
+    wanted = json.dumps(words, ensure_ascii=False)
+    for kanji, kana, entry in _pitch_rows(conn, _PITCH_MANY_WHERE, (wanted, wanted)):
+        if kanji in result:
+            result[kanji].append(entry)
+        if kana in result and kana != kanji and not _is_single_kanji(kana):
+            result[kana].append(entry)
+    return result
+
+
+# --- JMdict DB ---
+# Bumped whenever the JMdict schema changes; older DBs are rebuilt.
+# 3 added the meta table with the completion marker.
+JMDICT_SCHEMA_VERSION = 3
+
+JMDICT_SCHEMA = (
+    'CREATE TABLE entry (id INTEGER PRIMARY KEY, seq INTEGER)',
+    'CREATE TABLE kanji_form (entry_id INTEGER, pos INTEGER, text TEXT, PRIMARY KEY (entry_id, pos)) WITHOUT ROWID',
+    'CREATE TABLE reading (entry_id INTEGER, pos INTEGER, text TEXT, PRIMARY KEY (entry_id, pos)) WITHOUT ROWID',
+    'CREATE TABLE sense (id INTEGER PRIMARY KEY, entry_id INTEGER, pos INTEGER)',
+    'CREATE TABLE gloss (sense_id INTEGER, pos INTEGER, text TEXT, PRIMARY KEY (sense_id, pos)) WITHOUT ROWID',
+    # Every kanji and kana spelling of an entry points back at it
+    'CREATE TABLE entry_key (key TEXT, entry_id INTEGER, PRIMARY KEY (key, entry_id)) WITHOUT ROWID',
+    # Build facts; 'complete' is only written once every entry is in
+    'CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID',
+)
+JMDICT_INDEXES = (
+    'CREATE INDEX idx_sense_entry ON sense(entry_id, pos)',
+)
+
+
+def _jmdict_entry(elem):
+    seq = elem.findtext('ent_seq')
+    kanjis = [keb.text for k_ele in elem.findall('k_ele') for keb in k_ele.findall('keb') if keb.text]
+    kanas = [reb.text for r_ele in elem.findall('r_ele') for reb in r_ele.findall('reb') if reb.text]
+    senses = []
+    for sense in elem.findall('sense'):
+        glosses = [g.text for g in sense.findall('gloss') if g.text]
+        if glosses:
+            senses.append(glosses)
+    return {'seq': int(seq) if seq and seq.isdigit() else None, 'kanjis': kanjis, 'kanas': kanas, 'senses': senses}
+
+
+def iter_jmdict_entries(xml_path):
+    """
+    Stream {'seq', 'kanjis', 'kanas', 'senses'} dicts from JMdict_e_examp.XML,
+    where senses is a list of gloss lists. Each <entry> is cleared from the
+    tree once it has been read, so memory stays flat regardless of the
+    dictionary size.
+    """
+    context = ET.iterparse(xml_path, events=('start', 'end'))
+    root = None
+    for event, elem in context:
+        if root is None:
+            root = elem
+        if event == 'end' and elem.tag == 'entry':
+            yield _jmdict_entry(elem)
+            root.clear()
+
+
+def _jmdict_rows(entries):
+    # Flatten entries into (table, row) pairs with integer ids assigned in
+    # file order, so entry_key lists a word's entries in dictionary order.
+    sense_id = 0
+    for entry_id, entry in enumerate(entries, 1):
+        yield 'entry', (entry_id, entry.get('seq'))
+        for pos, text in enumerate(entry['kanjis']):
+            yield 'kanji_form', (entry_id, pos, text)
+        for pos, text in enumerate(entry['kanas']):
+            yield 'reading', (entry_id, pos, text)
+        for pos, glosses in enumerate(entry['senses']):
+            sense_id += 1
+            yield 'sense', (sense_id, entry_id, pos)
+            for gpos, text in enumerate(glosses):
+                yield 'gloss', (sense_id, gpos, text)
+        for key in entry['kanjis'] + entry['kanas']:
+            yield 'entry_key', (key, entry_id)
+
+
+_JMDICT_INSERTS = {
+    'entry': 'INSERT INTO entry (id, seq) VALUES (?, ?)',
+    'kanji_form': 'INSERT INTO kanji_form (entry_id, pos, text) VALUES (?, ?, ?)',
+    'reading': 'INSERT INTO reading (entry_id, pos, text) VALUES (?, ?, ?)',
+    'sense': 'INSERT INTO sense (id, entry_id, pos) VALUES (?, ?, ?)',
+    'gloss': 'INSERT INTO gloss (sense_id, pos, text) VALUES (?, ?, ?)',
+    'entry_key': 'INSERT OR IGNORE INTO entry_key (key, entry_id) VALUES (?, ?)',
+}
+
+
+def build_jmdict_db(entries, db_path, batch_size=BUILD_BATCH_SIZE, progress=None):
+    """
+    Build the normalized JMdict_e_examp.sqlite from an iterable of entry
+    dicts (see iter_jmdict_entries). Rows are written in batched
+    transactions to a temp file that is renamed over db_path. progress,
+    if given, is called with the row count after every batch.
+    """
+    started = time.perf_counter()
+    conn, tmp = _open_build_db(db_path)
+    try:
+        for stmt in JMDICT_SCHEMA:
+            conn.execute(stmt)
+        rows = 0
+        entry_count = 0
+        for batch in _batches(_jmdict_rows(entries), batch_size):
+            by_table = {}
+            for table, row in batch:
+                by_table.setdefault(table, []).append(row)
+            for table in _JMDICT_INSERTS:
+                if table in by_table:
+                    conn.executemany(_JMDICT_INSERTS[table], by_table[table])
+            conn.commit()
+            rows += len(batch)
+            entry_count += len(by_table.get('entry', ()))
+            if progress:
+                progress(rows)
+        for stmt in JMDICT_INDEXES:
+            conn.execute(stmt)
+        _write_jmdict_meta(conn, entry_count)
+        conn.execute('PRAGMA user_version = {}'.format(JMDICT_SCHEMA_VERSION))
+        _finish_build_db(conn, tmp, db_path)
+    except BaseException:
+        _abort_build_db(conn, tmp)
+        raise
+    build_key_filter(db_path, JMDICT_KEYS_SQL)
+    return _build_stats(rows, started)
+
+
+def _write_jmdict_meta(conn, entry_count):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('entries', ?)", (str(entry_count),))
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('complete', '1')")
+
+
+def jmdict_db_complete(conn):
+    """True if conn is a JMdict DB whose build ran to the end."""
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'complete'").fetchone()
+    except sqlite3.OperationalError:
+        return False
+    return row is not None and row[0] == '1'
+
+
+def _dedup_legacy_entries(word_entries):
+    # Legacy exports store one copy of every entry per spelling; keep the
+    # first copy of each and turn its joined meanings back into senses.
+    seen = set()
+    for entries in word_entries:
+        for entry in entries:
+            key = json.dumps(entry, ensure_ascii=False, sort_keys=True)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield {
+                'seq': None,
+                'kanjis': entry.get('kanjis', []),
+                'kanas': entry.get('kanas', []),
+                'senses': [[m] for m in entry.get('meanings', [])],
+            }
+
+
+def _iter_jmdict_json(json_path):
+    with open(json_path, 'r', encoding='utf-8') as f:
+        jmdict = json.load(f)
+    return _dedup_legacy_entries(jmdict.values())
+
+
+def _iter_jmdict_legacy_db(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('SELECT data FROM entries ORDER BY rowid').fetchall()
+    finally:
+        conn.close()
+    return _dedup_legacy_entries(json.loads(data) for data, in rows)
+
+
+def _schema_version(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _jmdict_source(xml_path, json_path, db_path):
+    """Return the source the JMdict DB has to be (re)built from, or None if it is current."""
+    if os.path.exists(db_path):
+        if _schema_version(db_path) >= JMDICT_SCHEMA_VERSION:
+            return None
+        return 'xml' if os.path.exists(xml_path) else 'legacy_db'
+    if os.path.exists(xml_path):
+        return 'xml'
+    if os.path.exists(json_path):
+        return 'json'
+    return None
+
+
+def jmdict_db_needs_build(xml_path, json_path, db_path):
+    try:
+        return _jmdict_source(xml_path, json_path, db_path) is not None
+    except Exception:
+        return False
+
+
+def build_jmdict_db_from_source(xml_path, json_path, db_path, progress=None):
+    """Build the JMdict DB from whichever source _jmdict_source picks; None if current."""
+    source = _jmdict_source(xml_path, json_path, db_path)
+    if source == 'xml':
+        entries = iter_jmdict_entries(xml_path)
+    elif source == 'json':
+        entries = _iter_jmdict_json(json_path)
+    elif source == 'legacy_db':
+        entries = _iter_jmdict_legacy_db(db_path)
+    else:
+        return None
+    return build_jmdict_db(entries, db_path, progress=progress)
+
+
+def ensure_jmdict_db(xml_path, json_path, db_path):
+    """
+    Build the JMdict DB if it is missing or uses an older schema, streaming
+    straight from the XML. Falls back to a legacy JSON export, or to the
+    old entries(word, data) table, when the XML is not installed.
+    """
+    if _builds_deferred:
+        return
+    try:
+        stats = build_jmdict_db_from_source(xml_path, json_path, db_path)
+        if stats:
+            report_build(os.path.basename(db_path), stats)
+    except Exception:
+        pass
+    ensure_key_filter(db_path, JMDICT_KEYS_SQL)
+
+
+_JMDICT_KANJI_SQL = (
+    'SELECT k.entry_id, f.text FROM entry_key k JOIN kanji_form f ON f.entry_id = k.entry_id '
+    'WHERE k.key = ? ORDER BY k.entry_id, f.pos'
+)
+_JMDICT_READING_SQL = (
+    'SELECT k.entry_id, r.text FROM entry_key k JOIN reading r ON r.entry_id = k.entry_id '
+    'WHERE k.key = ? ORDER BY k.entry_id, r.pos'
+)
+_JMDICT_GLOSS_SQL = (
+    'SELECT k.entry_id, s.id, g.text FROM entry_key k '
+    'JOIN sense s ON s.entry_id = k.entry_id JOIN gloss g ON g.sense_id = s.id '
+    'WHERE k.key = ? ORDER BY k.entry_id, s.pos, g.pos'
+)
+
+
+def jmdict_entry_ids(conn, word):
+    """Return the ids of the JMdict entries spelled as word, in dictionary order."""
+    return [row[0] for row in conn.execute('SELECT entry_id FROM entry_key WHERE key = ? ORDER BY entry_id', (word,))]
+
+
+def jmdict_entries(conn, word):
+    """
+    Return the JMdict entries for word in the {'kanjis', 'kanas', 'meanings'}
+    shape the add-on works with, built from three indexed joins.
+    """
+    entries = {}
+    for entry_id in jmdict_entry_ids(conn, word):
+        entries[entry_id] = {'kanjis': [], 'kanas': [], 'meanings': []}
+    if not entries:
+        return []
+    for entry_id, text in conn.execute(_JMDICT_KANJI_SQL, (word,)):
+        entries[entry_id]['kanjis'].append(text)
+    for entry_id, text in conn.execute(_JMDICT_READING_SQL, (word,)):
+        entries[entry_id]['kanas'].append(text)
+    senses = {}
+    for entry_id, sense_id, text in conn.execute(_JMDICT_GLOSS_SQL, (word,)):
+        if sense_id not in senses:
+            senses[sense_id] = []
+            entries[entry_id]['meanings'].append(senses[sense_id])
+        senses[sense_id].append(text)
+    for entry in entries.values():
+        entry['meanings'] = ['; '.join(glosses) for glosses in entry['meanings']]
+    return list(entries.values())
+
+
+_JMDICT_KEYS_MANY_SQL = (
+    'SELECT key, entry_id FROM entry_key WHERE key IN (SELECT value FROM json_each(?)) '
+    'ORDER BY key, entry_id'
+)
+_JMDICT_KANJI_MANY_SQL = (
+    'SELECT entry_id, text FROM kanji_form WHERE entry_id IN (SELECT value FROM json_each(?)) '
+    'ORDER BY entry_id, pos'
+)
+_JMDICT_READING_MANY_SQL = (
+    'SELECT entry_id, text FROM reading WHERE entry_id IN (SELECT value FROM json_each(?)) '
+    'ORDER BY entry_id, pos'
+)
+_JMDICT_GLOSS_MANY_SQL = (
+    'SELECT s.entry_id, s.id, g.text FROM sense s JOIN gloss g ON g.sense_id = s.id '
+    'WHERE s.entry_id IN (SELECT value FROM json_each(?)) ORDER BY s.entry_id, s.pos, g.pos'
+)
+
+
+def jmdict_entries_many(conn, words):
+    """
+    Batched jmdict_entries: resolves all words with four set-based queries
+    and returns {word: [entry, ...]}. Entries shared by several words are
+    built once and shared between their lists.
+    """
+    words = list(dict.fromkeys(words))
+    result = {word: [] for word in words}
+    if not words:
+        return result
+    ids_by_word = {}
+    for key, entry_id in conn.execute(_JMDICT_KEYS_MANY_SQL, (json.dumps(words, ensure_ascii=False),)):
+        ids_by_word.setdefault(key, []).append(entry_id)
+    entries = {}
+    for ids in ids_by_word.values():
+        for entry_id in ids:
+            entries[entry_id] = {'kanjis': [], 'kanas': [], 'meanings': []}
+    if not entries:
+        return result
+    wanted = json.dumps(list(entries))
+    for entry_id, text in conn.execute(_JMDICT_KANJI_MANY_SQL, (wanted,)):
+        entries[entry_id]['kanjis'].append(text)
+    for entry_id, text in conn.execute(_JMDICT_READING_MANY_SQL, (wanted,)):
+        entries[entry_id]['kanas'].append(text)
+    senses = {}
+    for entry_id, sense_id, text in conn.execute(_JMDICT_GLOSS_MANY_SQL, (wanted,)):
+        if sense_id not in senses:
+            senses[sense_id] = []
+            entries[entry_id]['meanings'].append(senses[sense_id])
+        senses[sense_id].append(text)
+    for entry in entries.values():
+        entry['meanings'] = ['; '.join(glosses) for glosses in entry['meanings']]
+    for word, ids in ids_by_word.items():
+        result[word] = [entries[entry_id] for entry_id in ids]
+    return result
+
+
+# --- Word frequency DB ---
+# Bumped whenever the derived frequency tables change; older DBs are upgraded.
+FREQUENCY_SCHEMA_VERSION = 1
+
+_HIRAGANA_TO_KATAKANA = {code: code + 0x60 for code in range(0x3041, 0x3097)}
+
+
+def katakana_reading(text):
+    """Normalize a reading to katakana, the form word_readings stores."""
+    return text.translate(_HIRAGANA_TO_KATAKANA) if text else text
+
+
+def build_frequency_tables(db_path):
+    """
+    Add the derived tables to japanese_word_frequencies.sqlite:
+    a katakana-normalized reading_norm column on word_readings, indexed on
+    (word, reading_norm), and word_max_frequency(word, freq, best_reading)
+    holding each word's highest-frequency reading. The DB is upgraded on a
+    temp copy that is renamed over db_path. Returns a stats dict.
+    """
+    started = time.perf_counter()
+    tmp = _tmp_path(db_path)
+    shutil.copyfile(db_path, tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.create_function('katakana_reading', 1, katakana_reading, deterministic=True)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(word_readings)')}
+        if 'reading_norm' not in columns:
+            conn.execute('ALTER TABLE word_readings ADD COLUMN reading_norm TEXT')
+        conn.execute('UPDATE word_readings SET reading_norm = katakana_reading(reading)')
+        conn.execute('DROP INDEX IF EXISTS idx_word_readings_norm')
+        conn.execute('CREATE INDEX idx_word_readings_norm ON word_readings(word, reading_norm)')
+        conn.execute('DROP TABLE IF EXISTS word_max_frequency')
+        conn.execute(
+            'CREATE TABLE word_max_frequency (word TEXT PRIMARY KEY, freq INTEGER, best_reading TEXT) WITHOUT ROWID'
+        )
+        # SQLite fills bare columns from the row that produced max()
+        conn.execute(
+            'INSERT INTO word_max_frequency '
+            'SELECT word, max(frequency), reading FROM word_readings '
+            'WHERE frequency IS NOT NULL GROUP BY word'
+        )
+        rows = conn.execute('SELECT count(*) FROM word_max_frequency').fetchone()[0]
+        conn.execute('PRAGMA user_version={}'.format(FREQUENCY_SCHEMA_VERSION))
+        _finish_build_db(conn, tmp, db_path)
+    except BaseException:
+        _abort_build_db(conn, tmp)
+        raise
+    build_key_filter(db_path, FREQUENCY_KEYS_SQL)
+    return _build_stats(rows, started)
+
+
+_frequency_dbs_checked = set()
+
+
+def frequency_db_needs_build(db_path):
+    try:
+        return os.path.exists(db_path) and _schema_version(db_path) < FREQUENCY_SCHEMA_VERSION
+    except Exception:
+        return False
+
+
+def ensure_frequency_db(db_path):
+    """Add the derived frequency tables to db_path once, if it predates them."""
+    if _builds_deferred or db_path in _frequency_dbs_checked:
+        return
+    _frequency_dbs_checked.add(db_path)
+    if frequency_db_needs_build(db_path):
+        try:
+            report_build(os.path.basename(db_path) + ' frequency tables', build_frequency_tables(db_path))
+        except Exception:
+            pass
+    ensure_key_filter(db_path, FREQUENCY_KEYS_SQL)
+
+
+_MAX_FREQUENCY_SQL = 'SELECT freq, best_reading FROM word_max_frequency WHERE word=?'
+_MAX_FREQUENCY_MANY_SQL = (
+    'SELECT word, freq FROM word_max_frequency WHERE word IN (SELECT value FROM json_each(?))'
+)
+_READINGS_SQL = 'SELECT reading_norm, frequency FROM word_readings WHERE word=?'
+_FREQUENCY_MANY_SQL = (
+    'SELECT word, reading_norm, frequency FROM word_readings WHERE word IN (SELECT value FROM json_each(?))'
+)
+# Before build_frequency_tables has run (e.g. a read-only install)
+_LEGACY_READINGS_SQL = 'SELECT reading, frequency FROM word_readings WHERE word=?'
+_LEGACY_FREQUENCY_MANY_SQL = (
+    'SELECT word, reading, frequency FROM word_readings WHERE word IN (SELECT value FROM json_each(?))'
+)
+
+
+def max_frequency(conn, word):
+    """
+    Return (highest frequency, its reading) for word, or (0, None) if the
+    word has no frequency.
+    """
+    try:
+        row = conn.execute(_MAX_FREQUENCY_SQL, (word,)).fetchone()
+    except sqlite3.OperationalError:
+        freqs = [(freq, reading) for reading, freq in conn.execute(_LEGACY_READINGS_SQL, (word,)) if freq is not None]
+        row = max(freqs, key=lambda pair: pair[0]) if freqs else None
+    return tuple(row) if row else (0, None)
+
+
+def max_frequencies_many(conn, words):
+    """Batched max_frequency: {word: highest frequency}, 0 for unknown words."""
+    words = list(dict.fromkeys(words))
+    result = dict.fromkeys(words, 0)
+    if not words:
+        return result
+    wanted = json.dumps(words, ensure_ascii=False)
+    try:
+        result.update(conn.execute(_MAX_FREQUENCY_MANY_SQL, (wanted,)))
+    except sqlite3.OperationalError:
+        for word, _reading, freq in conn.execute(_LEGACY_FREQUENCY_MANY_SQL, (wanted,)):
+            if freq is not None and freq > result[word]:
+                result[word] = freq
+    return result
+
+
+def reading_frequencies(conn, word):
+    """Return {katakana reading: frequency} for every reading of word."""
+    try:
+        rows = conn.execute(_READINGS_SQL, (word,)).fetchall()
+    except sqlite3.OperationalError:
+        rows = [(katakana_reading(reading), freq) for reading, freq in conn.execute(_LEGACY_READINGS_SQL, (word,))]
+    return dict(rows)
+
+
+def reading_frequencies_many(conn, words):
+    """Return {(word, katakana reading): frequency} for every reading of the given words."""
+    words = list(dict.fromkeys(words))
+    if not words:
+        return {}
+    wanted = json.dumps(words, ensure_ascii=False)
+    try:
+        rows = conn.execute(_FREQUENCY_MANY_SQL, (wanted,)).fetchall()
+    except sqlite3.OperationalError:
+        rows = [(word, katakana_reading(reading), freq)
+                for word, reading, freq in conn.execute(_LEGACY_FREQUENCY_MANY_SQL, (wanted,))]
+    return {(word, reading): freq for word, reading, freq in rows}
@@ -0,0 +1,105 @@
+# example_store.py
+# Example sentences and related words per word, kept in a SQLite (WAL)
+# database keyed by word. Replaces the old kanji_examples.json, which was
+# rewritten in full after every online lookup; its contents are migrated
+# into the store the first time it is opened.
+import json
+import os
+import sqlite3
+import threading
+
+from .paths import EXAMPLES_DB_PATH, EXAMPLES_JSON_PATH
+
+# Bumped whenever the store schema changes
+EXAMPLES_SCHEMA_VERSION = 1
+
+_local = threading.local()
+
+
+def _migrate_json(conn, json_path):
+    """Copy every word of the legacy kanji_examples.json into the store."""
+    if not os.path.exists(json_path):
+        return 0
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception:
+        return 0
+    rows = [
+        (word, json.dumps(entry.get('examples', []), ensure_ascii=False),
+         json.dumps(entry.get('related_words', []), ensure_ascii=False))
+        for word, entry in data.items() if isinstance(entry, dict)
+    ]
+    conn.executemany('INSERT OR IGNORE INTO examples VALUES (?, ?, ?)', rows)
+    return len(rows)
+
+
+def open_store(db_path=None, json_path=None):
+    """
+    Open (creating and migrating if needed) the example store at db_path.
+    The connection is in autocommit mode; each write is its own transaction.
+    """
+    db_path = db_path or EXAMPLES_DB_PATH
+    json_path = json_path or EXAMPLES_JSON_PATH
+    conn = sqlite3.connect(db_path, timeout=10, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    if conn.execute('PRAGMA user_version').fetchone()[0] < EXAMPLES_SCHEMA_VERSION:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another thread or process may have migrated while we waited for the lock
+            if conn.execute('PRAGMA user_version').fetchone()[0] < EXAMPLES_SCHEMA_VERSION:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS examples '
+                    '(word TEXT PRIMARY KEY, examples TEXT, related_words TEXT) WITHOUT ROWID'
+                )
+                _migrate_json(conn, json_path)
+                conn.execute('PRAGMA user_version={}'.format(EXAMPLES_SCHEMA_VERSION))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            conn.close()
+            raise
+    return conn
+
+
+def _connection(db_path):
+    db_path = db_path or EXAMPLES_DB_PATH
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = conns[db_path] = open_store(db_path)
+    return conn
+
+
+def get_examples(word, db_path=None):
+    """
+    Return (examples, related_words) stored for word, or None if the word
+    has never been looked up.
+    """
+    row = _connection(db_path).execute(
+        'SELECT examples, related_words FROM examples WHERE word=?', (word,)).fetchone()
+    if row is None:
+        return None
+    return json.loads(row[0]), json.loads(row[1])
+
+
+def put_examples(word, examples, related_words, db_path=None):
+    """Insert or replace the stored examples of a single word."""
+    _connection(db_path).execute(
+        'INSERT OR REPLACE INTO examples VALUES (?, ?, ?)',
+        (word, json.dumps(list(examples), ensure_ascii=False), json.dumps(list(related_words), ensure_ascii=False)),
+    )
+
+
+def close_store():
+    """Close the calling thread's store connections."""
+    conns = getattr(_local, 'conns', None) or {}
+    for conn in conns.values():
+        try:
+            conn.close()
+        except Exception:
+            pass
+    _local.conns = {}
@@ -0,0 +1,28 @@
+# lazy.py
+# Load-on-first-use helpers. Importing the add-on only registers hooks and
+# menu actions; datasets and heavy dependencies are loaded by the first
+# lookup that needs them.
+import functools
+import threading
+
+
+def once(loader):
+    """
+    Wrap a zero-argument loader so it runs on the first call only; later
+    calls return the same result. wrapper.reset() forgets the result so the
+    next call loads again (e.g. after the data files were rebuilt).
+    """
+    lock = threading.Lock()
+    state = {}
+
+    @functools.wraps(loader)
+    def wrapper():
+        if 'value' not in state:
+            with lock:
+                if 'value' not in state:
+                    state['value'] = loader()
+        return state['value']
+
+    wrapper.reset = state.clear
+    wrapper.loaded = lambda: 'value' in state
+    return wrapper
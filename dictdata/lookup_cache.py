@@ -0,0 +1,95 @@
+# lookup_cache.py
+# Bounded LRU caches shared by the dictionary lookup functions.
+# Every cache is registered by name so they can be inspected and
+# invalidated together when the data DBs are rebuilt.
+import threading
+from collections import OrderedDict
+
+# Default sizes (entries) for the caches used by the add-on
+CACHE_SIZES = {
+    'pitch_accent': 4096,
+    'jmdict': 4096,
+    'frequency': 16384,
+    'kanji_info': 2048,
+    'pitch_svg': 4096,
+}
+DEFAULT_CACHE_SIZE = 4096
+
+
+class LRUCache:
+    """Thread-safe LRU cache that counts hits, misses and evictions."""
+
+    def __init__(self, name, maxsize=DEFAULT_CACHE_SIZE):
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name, maxsize=None):
+    """Return the shared cache registered under name, creating it on first use."""
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            if maxsize is None:
+                maxsize = CACHE_SIZES.get(name, DEFAULT_CACHE_SIZE)
+            cache = _caches[name] = LRUCache(name, maxsize)
+        return cache
+
+
+def invalidate(name=None):
+    """Drop the cached results of one cache, or of all caches if name is None."""
+    with _caches_lock:
+        caches = [_caches[name]] if name in _caches else ([] if name else list(_caches.values()))
+    for cache in caches:
+        cache.clear()
+
+
+def cache_stats():
+    """Return {cache name: stats dict} for every registered cache."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.stats() for cache in caches}
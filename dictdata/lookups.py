@@ -0,0 +1,475 @@
+# lookups.py
+# Dictionary lookups shared by the card creator and the lookup dialog, and
+# get_word_info, which gathers everything shown for a word in one pass.
+# Qt-free so it can be used from tests and command-line scripts as well.
+import json
+import os
+from collections import namedtuple
+from types import MappingProxyType
+from .dictdb import ensure_pitch_db, ensure_jmdict_db, jmdict_entries, jmdict_entries_many, jmdict_db_complete, pitch_entries, pitch_entries_many
+from .dictdb import ensure_frequency_db, max_frequency, max_frequencies_many, reading_frequencies_many, katakana_reading
+from .db_pool import get_connection, get_key_filter
+from .lookup_cache import get_cache
+from .example_store import get_examples
+from .lazy import once
+from .paths import (
+    JM_DICT_PATH, PITCH_DB_PATH, KANJI_INFO_PATH, PITCH_DB_SQLITE_PATH,
+    JMDICT_JSON_PATH, JMDICT_SQLITE_PATH, FREQ_SQLITE_PATH)
+
+
+# --- Convert CSV to SQLite if needed ---
+def ensure_pitchdb_sqlite():
+    ensure_pitch_db(PITCH_DB_PATH, PITCH_DB_SQLITE_PATH)
+
+# --- On-demand Pitch Accent Lookup (no global index) ---
+_pitch_accent_cache = get_cache('pitch_accent')
+
+def _frozen(rows):
+    # Read-only views of rows, list values as tuples, for results that are
+    # cached or hold cached rows: a caller cannot change them for later ones
+    return tuple(MappingProxyType({key: tuple(value) if isinstance(value, list) else value
+                                   for key, value in row.items()})
+                 for row in rows)
+
+# Results are cached and shared by every caller, so they are tuples
+_NO_PITCH_ACCENT = ((), '', (), '')
+
+def _pitch_accent_result(entries):
+    if not entries:
+        return _NO_PITCH_ACCENT
+    # Collect all unique accented_kanas readings in order
+    accented_kanas = []
+    seen = set()
+    for e in entries:
+        ak = e["accented_kana"]
+        if ak and ak not in seen:
+            accented_kanas.append(ak)
+            seen.add(ak)
+    pitch_patterns = [e["pattern"] for e in entries]
+    normal_kanas = []
+    seen_kana = set()
+    for e in entries:
+        kana = e["kana"]
+        if kana and kana not in seen_kana:
+            normal_kanas.append(kana)
+            seen_kana.add(kana)
+    return (tuple(accented_kanas), accented_kanas[0] if accented_kanas else '', tuple(pitch_patterns), normal_kanas[0] if normal_kanas else '')
+
+# --- Bloom filter negative cache (see bloom.py) ---
+def _absent(db_path, word):
+    """True if the DB's bloom filter proves word is not in it; no SQLite access."""
+    try:
+        bloom = get_key_filter(db_path)
+        return bloom is not None and word not in bloom
+    except Exception:
+        return False
+
+def _maybe_present(db_path, words):
+    # The words a batched query still has to look for
+    try:
+        bloom = get_key_filter(db_path)
+    except Exception:
+        bloom = None
+    if bloom is None:
+        return list(words)
+    try:
+        return [word for word in words if word in bloom]
+    except Exception:
+        return list(words)
+
+def lookup_pitch_entries(word):
+    """Return the raw pitch_accents rows for word as dicts (see dictdb.pitch_entries)."""
+    ensure_pitchdb_sqlite()
+    if not os.path.exists(PITCH_DB_SQLITE_PATH) or _absent(PITCH_DB_SQLITE_PATH, word):
+        return []
+    try:
+        # A single kanji fetches all its readings; anything else matches kanji or kana
+        return pitch_entries(get_connection(PITCH_DB_SQLITE_PATH), word)
+    except Exception:
+        pass
+    return []
+
+def lookup_pitch_entries_many(words):
+    # Batched lookup_pitch_entries: {word: rows}, one query for all words
+    ensure_pitchdb_sqlite()
+    result = {word: [] for word in words}
+    if os.path.exists(PITCH_DB_SQLITE_PATH):
+        wanted = _maybe_present(PITCH_DB_SQLITE_PATH, result)
+        try:
+            if wanted:
+                result.update(pitch_entries_many(get_connection(PITCH_DB_SQLITE_PATH), wanted))
+        except Exception:
+            pass
+    return result
+
+def lookup_pitch_accent(word):
+    """
+    Lookup pitch accent for a word from wadoku_pitchdb.sqlite, with in-memory LRU cache.
+    Returns (accented readings, first accented reading, patterns, first kana);
+    the sequences are tuples, as the result is shared through the cache.
+    """
+    result = _pitch_accent_cache.get(word)
+    if result is not None:
+        return result
+    ensure_pitchdb_sqlite()
+    if not os.path.exists(PITCH_DB_SQLITE_PATH):
+        return _NO_PITCH_ACCENT
+    try:
+        entries = [] if _absent(PITCH_DB_SQLITE_PATH, word) else pitch_entries(get_connection(PITCH_DB_SQLITE_PATH), word)
+    except Exception:
+        # Not cached: a locked or replaced DB must not become a permanent miss
+        return _NO_PITCH_ACCENT
+    result = _pitch_accent_result(entries)
+    _pitch_accent_cache.put(word, result)
+    return result
+
+def lookup_pitch_accent_many(words):
+    """
+    Batched lookup_pitch_accent: returns {word: result} for all words,
+    resolving every uncached word with a single query.
+    """
+    results = {}
+    missing = []
+    for word in dict.fromkeys(words):
+        result = _pitch_accent_cache.get(word)
+        if result is None:
+            missing.append(word)
+        else:
+            results[word] = result
+    if not missing:
+        return results
+    ensure_pitchdb_sqlite()
+    if not os.path.exists(PITCH_DB_SQLITE_PATH):
+        results.update((word, _NO_PITCH_ACCENT) for word in missing)
+        return results
+    entries_by_word = {}
+    wanted = _maybe_present(PITCH_DB_SQLITE_PATH, missing)
+    try:
+        if wanted:
+            entries_by_word = pitch_entries_many(get_connection(PITCH_DB_SQLITE_PATH), wanted)
+    except Exception:
+        # As in lookup_pitch_accent, a failed query is not cached
+        results.update((word, _NO_PITCH_ACCENT) for word in missing)
+        return results
+    for word in missing:
+        result = _pitch_accent_result(entries_by_word.get(word, []))
+        _pitch_accent_cache.put(word, result)
+        results[word] = result
+    return results
+
+# --- SQLite-based JMdict Lookup ---
+def ensure_jmdict_sqlite():
+    """Create SQLite DB from the JMdict XML if not present."""
+    ensure_jmdict_db(JM_DICT_PATH, JMDICT_JSON_PATH, JMDICT_SQLITE_PATH)
+
+_ensure_sqlite_ran = False
+_jmdict_cache = get_cache('jmdict')
+
+# Largest JMdict JSON export (in MB on disk) the miss fallback may load;
+# parsed, it takes several times that in memory. 0 turns the fallback off.
+JMDICT_JSON_FALLBACK_MAX_MB = 64
+
+# DB paths whose completion marker has been seen; a complete DB is only
+# ever replaced by another complete one, so this is never cleared
+_complete_jmdict_dbs = set()
+
+def jmdict_db_is_complete():
+    """True once the JMdict DB holds the whole dictionary, so a miss there is final."""
+    if JMDICT_SQLITE_PATH in _complete_jmdict_dbs:
+        return True
+    if not os.path.exists(JMDICT_SQLITE_PATH):
+        return False
+    try:
+        complete = jmdict_db_complete(get_connection(JMDICT_SQLITE_PATH))
+    except Exception:
+        return False
+    if complete:
+        _complete_jmdict_dbs.add(JMDICT_SQLITE_PATH)
+        # Free the fallback data loaded while the DB was missing or building
+        _jmdict_json_index.reset()
+    return complete
+
+@once
+def _jmdict_json_index():
+    try:
+        if os.path.getsize(JMDICT_JSON_PATH) > JMDICT_JSON_FALLBACK_MAX_MB * 1024 * 1024:
+            return {}
+        with open(JMDICT_JSON_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _lookup_jmdict_json(word):
+    # Only consulted while there is no complete DB, and only for small exports
+    if jmdict_db_is_complete():
+        return []
+    return _jmdict_json_index().get(word, [])
+
+def _copy_entries(entries):
+    # Callers get their own entries; the cached ones are never handed out
+    return [{key: list(value) if isinstance(value, list) else value for key, value in entry.items()}
+            for entry in entries]
+
+def lookup_jmdict(word):
+    global _ensure_sqlite_ran
+    if not _ensure_sqlite_ran:
+        ensure_jmdict_sqlite()
+        _ensure_sqlite_ran = True
+    # Try SQLite lookup first (cached, including misses)
+    entries = _jmdict_cache.get(word)
+    if entries is None and os.path.exists(JMDICT_SQLITE_PATH):
+        try:
+            entries = [] if _absent(JMDICT_SQLITE_PATH, word) else jmdict_entries(get_connection(JMDICT_SQLITE_PATH), word)
+            _jmdict_cache.put(word, entries)
+        except Exception:
+            pass
+    if entries:
+        return _copy_entries(entries)
+    # A miss in a complete DB is final; the JSON export is only a stopgap
+    return _copy_entries(_lookup_jmdict_json(word))
+
+def lookup_jmdict_many(words):
+    """
+    Batched lookup_jmdict: returns {word: entries} for all words, resolving
+    every uncached word with a few set-based queries.
+    """
+    global _ensure_sqlite_ran
+    if not _ensure_sqlite_ran:
+        ensure_jmdict_sqlite()
+        _ensure_sqlite_ran = True
+    results = {}
+    missing = []
+    for word in dict.fromkeys(words):
+        entries = _jmdict_cache.get(word)
+        if entries is None:
+            missing.append(word)
+        else:
+            results[word] = entries
+    if missing and os.path.exists(JMDICT_SQLITE_PATH):
+        try:
+            fetched = {word: [] for word in missing}
+            wanted = _maybe_present(JMDICT_SQLITE_PATH, missing)
+            if wanted:
+                fetched.update(jmdict_entries_many(get_connection(JMDICT_SQLITE_PATH), wanted))
+            for word, entries in fetched.items():
+                _jmdict_cache.put(word, entries)
+            results.update(fetched)
+        except Exception:
+            pass
+    for word in dict.fromkeys(words):
+        results[word] = _copy_entries(results.get(word) or _lookup_jmdict_json(word))
+    return results
+
+# --- Kanji Info Lookup ---
+def _kanji_info_block(entry):
+    return {
+        'kanji': entry.get('kanji'),
+        'reading_on': entry.get('reading_on', ''),
+        'reading_kun': entry.get('reading_kun', ''),
+        'strokes': entry.get('number_of_strokes', ''),
+        'radical': entry.get('radical', ''),
+        'meaning': entry.get('meaning', ''),
+        'kanken_level': entry.get('kanken_level', ''),
+        'stroke_order': entry.get('stroke_order', ''),
+        'radical_reading': entry.get('radical_reading', ''),
+        'radical_information': entry.get('radical_information', ''),
+        'related_words': [w.strip() for w in entry.get('related_words', '').split(',') if w.strip()][:20]
+    }
+
+def build_kanji_info_index(entries):
+    """
+    Turn the kanji info list into {kanji: block}, with related_words split
+    once here instead of on every lookup. The first entry for a kanji wins.
+    """
+    index = {}
+    for entry in entries:
+        ch = entry.get('kanji')
+        if ch and ch not in index:
+            index[ch] = _kanji_info_block(entry)
+    return index
+
+# --- Load Kanji Info JSON (on first lookup) ---
+@once
+def kanji_info_index():
+    try:
+        with open(KANJI_INFO_PATH, 'r', encoding='utf-8') as f:
+            return build_kanji_info_index(json.load(f))
+    except Exception:
+        return {}
+
+_kanji_info_cache = get_cache('kanji_info')
+
+def get_kanji_info_blocks(word):
+    blocks = _kanji_info_cache.get(word)
+    if blocks is not None:
+        return blocks
+    blocks = []
+    index = kanji_info_index()
+    for ch in word:
+        if ord(ch) < 0x4e00 or ord(ch) > 0x9fff:
+            continue
+        block = index.get(ch)
+        if block is not None:
+            blocks.append(block)
+    blocks = _frozen(blocks)
+    _kanji_info_cache.put(word, blocks)
+    return blocks
+
+# --- Word Frequency Lookup ---
+# Max frequency over all readings is cached under (word, None), the
+# frequency of a single reading under (word, katakana reading)
+_frequency_cache = get_cache('frequency')
+
+def get_word_frequency(word):
+    freq = _frequency_cache.get((word, None))
+    if freq is not None:
+        return freq
+    ensure_frequency_db(FREQ_SQLITE_PATH)
+    if not os.path.exists(FREQ_SQLITE_PATH):
+        return 0
+    try:
+        freq = 0 if _absent(FREQ_SQLITE_PATH, word) else max_frequency(get_connection(FREQ_SQLITE_PATH), word)[0]
+        _frequency_cache.put((word, None), freq)
+        return freq
+    except Exception:
+        pass
+    return 0
+
+def get_word_frequency_many(words):
+    # Batched get_word_frequency: {word: max frequency}, one query for all cache misses
+    result = {}
+    missing = []
+    for word in dict.fromkeys(words):
+        freq = _frequency_cache.get((word, None))
+        if freq is None:
+            missing.append(word)
+        else:
+            result[word] = freq
+    if not missing:
+        return result
+    ensure_frequency_db(FREQ_SQLITE_PATH)
+    fetched = {}
+    if os.path.exists(FREQ_SQLITE_PATH):
+        try:
+            fetched = dict.fromkeys(missing, 0)
+            wanted = _maybe_present(FREQ_SQLITE_PATH, missing)
+            if wanted:
+                fetched.update(max_frequencies_many(get_connection(FREQ_SQLITE_PATH), wanted))
+        except Exception:
+            fetched = {}
+    for word in missing:
+        result[word] = fetched.get(word, 0)
+        if word in fetched:
+            _frequency_cache.put((word, None), result[word])
+    return result
+
+def get_reading_frequencies(pairs):
+    """
+    Frequencies of (word, kana) pairs as {(word, kana): freq}, -1 for
+    readings the frequency DB does not list. Cache misses are read in one
+    batch.
+    """
+    result = {}
+    missing = []
+    for word, kana in dict.fromkeys(pairs):
+        freq = _frequency_cache.get((word, katakana_reading(kana)))
+        if freq is None:
+            missing.append((word, kana))
+        else:
+            result[(word, kana)] = freq
+    if not missing:
+        return result
+    ensure_frequency_db(FREQ_SQLITE_PATH)
+    fetched = None
+    if os.path.exists(FREQ_SQLITE_PATH):
+        try:
+            wanted = _maybe_present(FREQ_SQLITE_PATH, dict.fromkeys(word for word, _kana in missing))
+            fetched = reading_frequencies_many(get_connection(FREQ_SQLITE_PATH), wanted) if wanted else {}
+        except Exception:
+            pass
+    for word, kana in missing:
+        key = (word, katakana_reading(kana))
+        result[(word, kana)] = fetched.get(key, -1) if fetched is not None else -1
+        if fetched is not None:
+            _frequency_cache.put(key, result[(word, kana)])
+    return result
+
+# --- Online sentence lookup (requests/bs4 are only imported on first use) ---
+@once
+def _sentence_lookup_module():
+    try:
+        from . import sentence_lookup
+        return sentence_lookup
+    except Exception:
+        return None
+
+def lookup_sentences_and_related(word):
+    """Stored examples and related words for word, fetched online on a miss."""
+    module = _sentence_lookup_module()
+    if module is None:
+        return get_local_examples(word)
+    return module.lookup_sentences_and_related(word)
+
+def get_example_sentences(word):
+    examples, _ = lookup_sentences_and_related(word)
+    return examples
+
+# --- Locally stored example sentences (filled by sentence_lookup) ---
+def get_local_examples(word):
+    """Return (examples, related_words) stored for word, without network access."""
+    try:
+        stored = get_examples(word)
+        if stored is not None:
+            return stored
+    except Exception:
+        pass
+    return [], []
+
+# --- Aggregate Word Lookup ---
+class WordInfo(namedtuple('WordInfo', [
+        'word', 'pitch_entries', 'jmdict_entries', 'kanji_blocks',
+        'frequency', 'examples', 'related_words'])):
+    """
+    Everything the card creator and the lookup dialog show for a word.
+    Immutable: the sequence fields are tuples, and the pitch, JMdict and
+    kanji rows in them are read-only mappings (list values as tuples), so
+    nothing reached through a WordInfo can change the lookup caches.
+    """
+    __slots__ = ()
+
+    def accented_readings(self):
+        """Unique accented kana readings, in DB order."""
+        return list(_pitch_accent_result(self.pitch_entries)[0])
+
+    def unique_pitch(self):
+        """Pitch entries with duplicate (kana, pattern) pairs removed."""
+        entries = []
+        seen = set()
+        for entry in self.pitch_entries:
+            key = (entry['kana'], entry['pattern'])
+            if key not in seen:
+                seen.add(key)
+                entries.append(entry)
+        return entries
+
+    def kana_readings(self):
+        """Kana readings of all JMdict entries."""
+        return [k for entry in self.jmdict_entries for k in entry.get('kanas', [])]
+
+    def meanings(self):
+        """JMdict meanings, one string per sense."""
+        return [m for entry in self.jmdict_entries for m in entry.get('meanings', [])]
+
+
+def get_word_info(word):
+    """Look up pitch, JMdict, kanji info, frequency and local examples for word, each once."""
+    examples, related_words = get_local_examples(word)
+    return WordInfo(
+        word=word,
+        pitch_entries=_frozen(lookup_pitch_entries(word)),
+        jmdict_entries=_frozen(lookup_jmdict(word)),
+        kanji_blocks=_frozen(get_kanji_info_blocks(word)),
+        frequency=get_word_frequency(word),
+        examples=tuple(tuple(pair) for pair in examples),
+        related_words=tuple(tuple(pair) for pair in related_words),
+    )
@@ -0,0 +1,119 @@
+# mora.py
+# Mora tokenizer and pitch pattern alignment, shared by the pitch DB build
+# (which stores aligned patterns) and pitch_svg (which draws them).
+import re
+
+# --- Mora tokenizer ---
+# Katakana ァ-ヶ map onto hiragana ぁ-ゖ; everything but hiragana and the
+# long vowel mark ー is dropped; a mora is a kana plus an optional small
+# combiner. Each step is one C-level call (a regex search, str.translate,
+# set.isdisjoint), and the rewriting ones only run when the search says
+# the reading needs them, which for most readings it does not.
+KATA_TO_HIRA = {code: code - 0x60 for code in range(ord('ァ'), ord('ヶ') + 1)}
+COMBINERS = frozenset('ゃゅょぁぃぅぇぉ')
+_KATA_RE = re.compile(r'[ァ-ヶ]')
+_NOT_HIRA_RE = re.compile(r'[^ぁ-ゖー]+')
+_MORA_RE = re.compile('.[{}]?'.format(''.join(sorted(COMBINERS))), re.S)
+
+
+def normalize_hira(hira):
+    """
+    Remove all characters except hiragana and small kana combiners.
+    This strips markup, punctuation, and non-hiragana symbols.
+    """
+    # Allow hiragana, small kana, and long vowel mark (ー)
+    if _NOT_HIRA_RE.search(hira) is None:
+        return hira
+    return _NOT_HIRA_RE.sub('', hira)
+
+
+def to_mora(reading):
+    """Mora of a hiragana or katakana reading, as hiragana: 'キョウ' -> ['きょ', 'う']."""
+    if _KATA_RE.search(reading) is not None:
+        reading = reading.translate(KATA_TO_HIRA)
+    hira = normalize_hira(reading)
+    if COMBINERS.isdisjoint(hira):
+        return list(hira)
+    return _MORA_RE.findall(hira)
+
+
+def to_mora_many(readings):
+    """to_mora for every reading in readings, in order; repeated readings are split once."""
+    split = {}
+    result = []
+    for reading in readings:
+        mora = split.get(reading)
+        if mora is None:
+            mora = split[reading] = to_mora(reading)
+        result.append(mora)
+    return result
+
+
+# --- Pattern alignment ---
+def pattern_to_mora_pitch(pattern, mora_list):
+    """
+    Map a pitch pattern string to mora units and post-mora.
+    Handles digraphs (e.g., Ll for りょ) by matching mora length to pattern length - 1.
+    """
+    if not pattern or not mora_list:
+        return []
+    n_mora = len(mora_list)
+    # If pattern length == n_mora+1, just use as is
+    if len(pattern) == n_mora + 1:
+        return list(pattern)
+    # Otherwise, try to group pattern chars to match mora count
+    groups = []
+    idx = 0
+    for mora in mora_list:
+        # If there are at least 2 pattern chars left and the next two are an upper-lower pair (e.g., Ll, Hl, etc.), treat as a digraph
+        if idx + 1 < len(pattern) - 1 and pattern[idx].isalpha() and pattern[idx+1].islower() and pattern[idx].isupper():
+            groups.append(pattern[idx] + pattern[idx+1])
+            idx += 2
+        # Special case: Wadoku uses 'Ll' for digraphs, but sometimes just 'L' or 'H' for single kana
+        elif idx + 1 < len(pattern) - 1 and pattern[idx:idx+2] in ['Ll', 'Hl', 'Hl', 'Ll', 'lh', 'hl']:
+            groups.append(pattern[idx:idx+2])
+            idx += 2
+        else:
+            groups.append(pattern[idx])
+            idx += 1
+    # Post-mora
+    groups.append(pattern[-1])
+    return groups
+
+
+# How a pattern was fitted to its reading: 'exact' (one character per
+# mora plus the particle), 'grouped' (digraph pairs such as Ll folded into
+# one mora), or, for rows whose pattern does not match the reading,
+# 'padded' (last height repeated) and 'truncated' (extra heights dropped)
+ALIGNED = ('exact', 'grouped')
+MISALIGNED = ('padded', 'truncated')
+
+
+def align_pattern(mora, patt):
+    """
+    Fit pattern patt to the mora of a reading: returns (groups, alignment)
+    with one pattern group per mora plus one for the particle.
+    """
+    n = len(mora) + 1
+    try:
+        groups = pattern_to_mora_pitch(patt, mora)
+    except IndexError:
+        # More mora than the pattern can cover
+        groups = []
+    if groups and len(groups) == n:
+        return groups, 'exact' if len(patt) == n else 'grouped'
+    # fallback to old logic
+    if len(patt) < n:
+        return list(patt + patt[-1] * (n - len(patt))), 'padded'
+    return list(patt[:n]), 'truncated'
+
+
+def group_height(group):
+    """'H' or 'L' for a pattern group; the first character sets the height."""
+    return 'H' if group and group[0] in ('H', 'h', '1', '2') else 'L'
+
+
+def pitch_heights(mora, patt):
+    """(heights, alignment): patt as one H or L per mora plus the particle."""
+    groups, alignment = align_pattern(mora, patt)
+    return ''.join(map(group_height, groups)), alignment
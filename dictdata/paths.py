@@ -0,0 +1,18 @@
+# paths.py
+# Locations of the add-on's data files. Every module reads its paths from
+# here instead of building them itself, so the datasets only have one
+# definition of where they live.
+import os
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ADDON_DIR, 'data')
+
+JM_DICT_PATH = os.path.join(DATA_DIR, 'JMdict_e_examp.XML')
+JMDICT_JSON_PATH = os.path.join(DATA_DIR, 'JMdict_e_examp.json')
+JMDICT_SQLITE_PATH = os.path.join(DATA_DIR, 'JMdict_e_examp.sqlite')
+PITCH_DB_PATH = os.path.join(DATA_DIR, 'wadoku_pitchdb.csv')
+PITCH_DB_SQLITE_PATH = os.path.join(DATA_DIR, 'wadoku_pitchdb.sqlite')
+KANJI_INFO_PATH = os.path.join(DATA_DIR, '常用漢字の書き取り.json')
+FREQ_SQLITE_PATH = os.path.join(DATA_DIR, 'japanese_word_frequencies.sqlite')
+EXAMPLES_DB_PATH = os.path.join(DATA_DIR, 'kanji_examples.sqlite')
+EXAMPLES_JSON_PATH = os.path.join(DATA_DIR, 'kanji_examples.json')
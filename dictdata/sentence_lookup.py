@@ -1,42 +1,21 @@
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
-import json
-import os
+from .example_store import get_examples, put_examples
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 GOO_BASE_URL = "https://dictionary.goo.ne.jp"
 GOO_SEARCH_URL = "https://dictionary.goo.ne.jp/en/"
 GOO_SEARCH_ACTION = "/freewordsearcher.html"
-KANJI_EXAMPLES_PATH = os.path.join(DATA_DIR, 'kanji_examples.json')
-
-
-def load_kanji_examples():
-    if os.path.exists(KANJI_EXAMPLES_PATH):
-        try:
-            with open(KANJI_EXAMPLES_PATH, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
-
-
-def save_kanji_examples(db):
-    try:
-        with open(KANJI_EXAMPLES_PATH, 'w', encoding='utf-8') as f:
-            json.dump(db, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
-
-
-KANJI_EXAMPLES_DB = load_kanji_examples()
 
 
 def lookup_sentences_and_related(word):
     # Check local DB first
-    if word in KANJI_EXAMPLES_DB:
-        entry = KANJI_EXAMPLES_DB[word]
-        return entry.get('examples', []), entry.get('related_words', [])
+    try:
+        stored = get_examples(word)
+    except Exception:
+        stored = None
+    if stored is not None:
+        return stored
 
     session = requests.Session()
     params = {
@@ -103,6 +82,8 @@ def lookup_sentences_and_related(word):
                     if translation:
                         related_words.append((word_text, translation))
     # Save to local DB
-    KANJI_EXAMPLES_DB[word] = {'examples': examples, 'related_words': related_words}
-    save_kanji_examples(KANJI_EXAMPLES_DB)
+    try:
+        put_examples(word, examples, related_words)
+    except Exception:
+        pass
     return examples, related_words
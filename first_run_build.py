@@ -0,0 +1,147 @@
+# first_run_build.py
+# Starts dictdata.build_worker in the background when data DBs are missing or
+# outdated, and shows its progress in a non-modal dialog. Lookups keep
+# working meanwhile (with whatever data exists) and see the new DBs once
+# the build has finished. Without a usable Python executable the same
+# builds run in a QThread instead. If the build fails, the data builds
+# stay deferred for the session and the error is shown.
+import json
+import os
+import sys
+from aqt import mw
+from aqt.qt import QProcess, QProgressDialog, QThread, Qt, pyqtSignal
+from aqt.utils import showWarning
+from .dictdata import build_worker
+from .dictdata import ADDON_DIR, defer_builds, pause_pool, invalidate
+
+# Run as a module of the add-on directory so its relative imports resolve
+WORKER_MODULE = 'dictdata.build_worker'
+
+STEP_LABELS = {
+    'pitch': 'Building pitch accent database',
+    'pitch_patterns': 'Aligning pitch accent patterns',
+    'jmdict': 'Building JMdict database',
+    'frequency': 'Indexing word frequencies',
+    'filters': 'Building lookup filters',
+}
+
+_active_build = None
+
+
+def _python_executable():
+    # Packaged Anki builds point sys.executable at the Anki binary itself
+    exe = sys.executable or ''
+    if os.path.basename(exe).lower().startswith('python'):
+        return exe
+    return None
+
+
+class _BuildThread(QThread):
+    event = pyqtSignal(dict)
+
+    def run(self):
+        build_worker.run_builds(self.event.emit)
+
+
+class FirstRunBuild:
+    def __init__(self, steps, parent=None):
+        self.steps = steps
+        self.process = None
+        self.thread = None
+        self._buffer = b''
+        # 'step: message' of every step that failed
+        self.errors = []
+        self.dialog = QProgressDialog('Preparing dictionary data...', 'Hide', 0, len(steps), parent)
+        self.dialog.setWindowTitle('Japanese Word Creator')
+        self.dialog.setWindowModality(Qt.WindowModality.NonModal)
+        self.dialog.setAutoClose(False)
+        self.dialog.setAutoReset(False)
+        self.dialog.setMinimumDuration(0)
+        self.dialog.canceled.connect(self.dialog.hide)
+
+    def start(self):
+        defer_builds(True)
+        # Lookups meanwhile must not keep the files open that the build replaces
+        pause_pool(True)
+        self.dialog.show()
+        python = _python_executable()
+        if python is None:
+            self._start_thread()
+            return
+        self.process = QProcess()
+        self.process.readyReadStandardOutput.connect(self._on_output)
+        self.process.finished.connect(self._on_process_finished)
+        self.process.errorOccurred.connect(self._on_process_error)
+        self.process.setWorkingDirectory(ADDON_DIR)
+        self.process.start(python, ['-m', WORKER_MODULE, '--memory-mb', str(build_worker.MEMORY_LIMIT_MB)])
+
+    def _start_thread(self):
+        self.process = None
+        self.thread = _BuildThread()
+        self.thread.event.connect(self._on_event)
+        self.thread.start()
+
+    def _on_process_error(self, error):
+        if error == QProcess.ProcessError.FailedToStart:
+            self._start_thread()
+
+    def _on_output(self):
+        self._buffer += bytes(self.process.readAllStandardOutput())
+        *lines, self._buffer = self._buffer.split(b'\n')
+        for line in lines:
+            line = line.strip()
+            if not line.startswith(b'{'):
+                continue
+            try:
+                self._on_event(json.loads(line.decode('utf-8')))
+            except ValueError:
+                pass
+
+    def _on_process_finished(self, exit_code, exit_status):
+        if exit_status != QProcess.ExitStatus.NormalExit:
+            # e.g. killed for going over the memory limit
+            self.errors.append('build worker crashed (exit code {})'.format(exit_code))
+        elif exit_code != 0 and not self.errors:
+            self.errors.append('build worker exited with code {}'.format(exit_code))
+        self._finish()
+
+    def _on_event(self, event):
+        kind = event.get('event')
+        step = event.get('step')
+        if kind == 'progress':
+            self.dialog.setLabelText('{}... {:,} rows'.format(STEP_LABELS.get(step, step), event.get('rows', 0)))
+        elif kind in ('done', 'error'):
+            if kind == 'error':
+                self.errors.append('{}: {}'.format(STEP_LABELS.get(step, step), event.get('message', '')))
+            if step in self.steps:
+                self.dialog.setValue(self.steps.index(step) + 1)
+        elif kind == 'finished' and self.thread is not None:
+            self._finish()
+
+    def _finish(self):
+        global _active_build
+        # Drop pooled connections and cached lookups made against the old
+        # files; on the main thread, since the build may have run in another
+        pause_pool(False)
+        invalidate()
+        self.dialog.close()
+        _active_build = None
+        if self.errors:
+            # Leave the builds deferred: building on the main thread would
+            # hit the same failure, only while blocking Anki
+            showWarning('Building the dictionary data failed; lookups use the data that exists.\n\n'
+                        + '\n'.join(self.errors))
+            return
+        defer_builds(False)
+
+
+def start_first_run_build():
+    """Start the background build if any data DB is missing or outdated."""
+    global _active_build
+    if _active_build is not None:
+        return
+    steps = build_worker.pending_steps()
+    if not steps:
+        return
+    _active_build = FirstRunBuild(steps, mw)
+    _active_build.start()
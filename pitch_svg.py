@@ -5,60 +5,13 @@ try:
     import jaconv
 except ImportError:
     jaconv = None
-
-def normalize_hira(hira):
-    """
-    Remove all characters except hiragana and small kana combiners.
-    This strips markup, punctuation, and non-hiragana symbols.
-    """
-    # Allow hiragana, small kana, and long vowel mark (ー)
-    return ''.join(c for c in hira if re.match(r'[ぁ-ゖー]', c))
-
+from .dictdata.lookup_cache import get_cache
+from .dictdata.mora import (
+    COMBINERS, KATA_TO_HIRA, align_pattern, group_height, normalize_hira,
+    pattern_to_mora_pitch, to_mora, to_mora_many)
 
 def hira_to_mora(hira):
-    hira = normalize_hira(hira)
-    mora_arr = []
-    combiners = ['ゃ', 'ゅ', 'ょ', 'ぁ', 'ぃ', 'ぅ', 'ぇ', 'ぉ',
-                 'ャ', 'ュ', 'ョ', 'ァ', 'ィ', 'ゥ', 'ェ', 'ォ']
-    i = 0
-    while i < len(hira):
-        if i+1 < len(hira) and hira[i+1] in combiners:
-            mora_arr.append(hira[i] + hira[i+1])
-            i += 2
-        else:
-            mora_arr.append(hira[i])
-            i += 1
-    return mora_arr
-
-def pattern_to_mora_pitch(pattern, mora_list):
-    """
-    Map a pitch pattern string to mora units and post-mora.
-    Handles digraphs (e.g., Ll for りょ) by matching mora length to pattern length - 1.
-    """
-    if not pattern or not mora_list:
-        return []
-    n_mora = len(mora_list)
-    # If pattern length == n_mora+1, just use as is
-    if len(pattern) == n_mora + 1:
-        return list(pattern)
-    # Otherwise, try to group pattern chars to match mora count
-    groups = []
-    idx = 0
-    for mora in mora_list:
-        # If there are at least 2 pattern chars left and the next two are an upper-lower pair (e.g., Ll, Hl, etc.), treat as a digraph
-        if idx + 1 < len(pattern) - 1 and pattern[idx].isalpha() and pattern[idx+1].islower() and pattern[idx].isupper():
-            groups.append(pattern[idx] + pattern[idx+1])
-            idx += 2
-        # Special case: Wadoku uses 'Ll' for digraphs, but sometimes just 'L' or 'H' for single kana
-        elif idx + 1 < len(pattern) - 1 and pattern[idx:idx+2] in ['Ll', 'Hl', 'Hl', 'Ll', 'lh', 'hl']:
-            groups.append(pattern[idx:idx+2])
-            idx += 2
-        else:
-            groups.append(pattern[idx])
-            idx += 1
-    # Post-mora
-    groups.append(pattern[-1])
-    return groups
+    return to_mora(hira)
 
 def circle(x, y, o=False):
     if o:
@@ -93,79 +46,265 @@ def katakana_to_hiragana(text):
     if jaconv:
         return jaconv.kata2hira(text)
     # Fallback: Unicode offset for katakana block
-    return ''.join(chr(ord(ch) - 0x60) if 'ァ' <= ch <= 'ン' else ch for ch in text)
+    return text.translate(KATA_TO_HIRA)
 
-def create_svg_pitch_pattern(word, patt):
-    # If multiple patterns are present, use only the first
-    if ',' in str(patt):
-        patt = str(patt).split(',')[0].strip()
-    # Always convert katakana to hiragana for mora splitting
-    hira_word = katakana_to_hiragana(word)
-    mora = hira_to_mora(hira_word)
-    pitch_groups = pattern_to_mora_pitch(patt, mora)
-    if not pitch_groups or len(pitch_groups) != len(mora) + 1:
-        # fallback to old logic
-        if len(patt) < len(mora) + 1:
-            last_char = patt[-1]
-            patt = patt + (last_char * (len(mora) + 1 - len(patt)))
-        elif len(patt) > len(mora) + 1:
-            patt = patt[:len(mora) + 1]
-        pitch_groups = list(patt)
-    positions = len(pitch_groups)
-    step_width = 35
-    margin_lr = 16
-    svg_width = max(0, ((positions-1) * step_width) + (margin_lr*2))
-    svg = ('<svg class="pitch" width="{0}px" height="75px" viewBox="0 0 {0} 75" '
-           'style="background-color:#20242b; border-radius:4px; padding:12px;">').format(svg_width)
-    # Add mora characters
-    chars = ''
-    for pos, mor in enumerate(mora):
-        x_center = margin_lr + (pos * step_width)
-        chars += text(x_center-11, mor)
-    # Add circles and connecting paths
-    circles = ''
-    paths = ''
-    prev_center = (None, None)
+# Diagram styles: 'card' is the note field/card diagram (background from the
+# svg style), 'panel' the lookup dialog one (background rect with padding)
+# and 'compact' the card diagram with class names and grouped styling instead
+# of inline styles, for note fields where every byte is stored and synced
+STYLES = ('card', 'panel', 'compact')
+STEP_WIDTH = 35
+MARGIN_LR = 16
+PANEL_PADDING = 12
+_CARD_OPEN = ('<svg class="pitch" width="{0}px" height="75px" viewBox="0 0 {0} 75" '
+              'style="background-color:#20242b; border-radius:4px; padding:12px;">')
+_PANEL_OPEN = ('<svg class="pitch" width="{0}px" height="{1}px" viewBox="0 0 {0} {1}">'
+               '<rect x="0" y="0" width="{0}" height="{1}" rx="8" fill="#20242b"/>')
+# Compact diagrams group the mora, the line segments and the dots, so the
+# styling is written once per diagram instead of once per element. The
+# presentation attributes keep the look of the 'card' style where the
+# note type's CSS lacks the pitch-* classes; css_card.css rules win over them.
+_COMPACT_MORA = '<text class="pitch-mora" y="67.5" fill="#fff" font-family="sans-serif" font-size="20">'
+_COMPACT_LINE = '<path class="pitch-line" d="{}" fill="none" stroke="#00f" stroke-width="1.5"/>'
+_COMPACT_DOT = '<circle cx="{}" cy="{}" r="5"/>'
+_COMPACT_END = '<circle class="pitch-end" cx="{}" cy="{}" r="5" fill="#fff" stroke="#000" stroke-width="1.5"/>'
+_SEGMENT_DELTAS = {'s': '0', 'u': '-25', 'd': '25'}
+# Style of the diagrams written into note fields
+FIELD_STYLE = 'compact'
+# What goes into the pitch_accent field: 'svg' for rendered diagrams, or
+# 'data' for pitch data ("かわいい:LHHHH;はし:HLL") drawn by the review
+# template's script. Data fields need a note type with the current
+# card_templates/review/back_card.html.
+FIELD_FORMATS = ('svg', 'data')
+FIELD_FORMAT = 'svg'
+# Attribute of that template's <script> tag, to tell note types that draw
+# pitch data from ones that would show it as plain text
+PITCH_DATA_RENDERER = 'data-pitch-renderer'
+
+def renders_pitch_data(note_type):
+    """True if a card template of note_type (an Anki note type dict) draws pitch data."""
+    return any(PITCH_DATA_RENDERER in tmpl.get('qfmt', '') + tmpl.get('afmt', '')
+               for tmpl in note_type.get('tmpls', ()))
+
+def check_field_format(note_type, field_format=None):
+    """
+    Raise ValueError if field_format (default FIELD_FORMAT) is 'data' and
+    note_type has no template that draws it.
+    """
+    if (field_format or FIELD_FORMAT) == 'data' and not renders_pitch_data(note_type):
+        raise ValueError("note type '{}' cannot draw pitch data; add the script of "
+                         "card_templates/review/back_card.html to its back template or set "
+                         "pitch_svg.FIELD_FORMAT = 'svg'".format(note_type.get('name', '')))
+
+def _pitch_groups(mora, patt):
+    return align_pattern(mora, patt)[0]
+
+def _num(v):
+    # Coordinates rounded to 0.1px, without a trailing .0
+    return '{:g}'.format(round(v, 1))
+
+def _build_svg(hira_word, patt, style, mora=None):
+    if mora is None:
+        mora = hira_to_mora(hira_word)
+        pitch_groups = _pitch_groups(mora, patt)
+    else:
+        # Already aligned (pitch DB pitch_pattern rows): one H/L per group
+        pitch_groups = patt
+    content_width = max(0, ((len(pitch_groups)-1) * STEP_WIDTH) + (MARGIN_LR*2))
+    if style == 'panel':
+        pad = PANEL_PADDING
+        # 2px right and bottom gap between neighbouring diagrams
+        parts = [_PANEL_OPEN.format(content_width + pad*2 + 2, 65 + pad*2 + 2)]
+    else:
+        pad = 0
+        parts = [_CARD_OPEN.format(content_width)]
+    x0 = pad + MARGIN_LR
+    centers = []
     for pos, accent in enumerate(pitch_groups):
-        x_center = margin_lr + (pos * step_width)
         # Use first char of group for pitch height
         a = accent[0] if accent else 'L'
-        if a in ['H', 'h', '1', '2']:
-            y_center = 5
-        elif a in ['L', 'l', '0']:
-            y_center = 30
+        centers.append((x0 + (pos * STEP_WIDTH), pad + (5 if a in ('H', 'h', '1', '2') else 30)))
+    segments = [(px, py, 's' if py == y else ('d' if py < y else 'u'))
+                for (px, py), (_, y) in zip(centers, centers[1:])]
+    n_mora = len(mora)
+    if style == 'compact':
+        _compact_body(parts, mora, centers, segments, x0)
+    else:
+        # Mora characters, then connecting paths, then circles on top
+        parts.extend(text(x0 + (pos * STEP_WIDTH) - 11, mor) for pos, mor in enumerate(mora))
+        parts.extend(path(px, py, typ, STEP_WIDTH) for px, py, typ in segments)
+        parts.extend(circle(x, y, pos >= n_mora) for pos, (x, y) in enumerate(centers))
+    parts.append('</svg>')
+    return ''.join(parts)
+
+def _compact_body(parts, mora, centers, segments, x0):
+    n_mora = len(mora)
+    # Same positions as text(): digraphs put the small kana right of the big one
+    parts.append(_COMPACT_MORA)
+    for pos, mor in enumerate(mora):
+        x = x0 + (pos * STEP_WIDTH) - 11
+        if len(mor) == 1:
+            parts.append('<tspan x="{}">{}</tspan>'.format(_num(x), mor))
         else:
-            y_center = 30
-        circles += circle(x_center, y_center, pos >= len(mora))
-        if pos > 0:
-            if prev_center[1] == y_center:
-                path_typ = 's'
-            elif prev_center[1] < y_center:
-                path_typ = 'd'
-            elif prev_center[1] > y_center:
-                path_typ = 'u'
-            paths += path(prev_center[0], prev_center[1], path_typ, step_width)
-        prev_center = (x_center, y_center)
-    svg += chars
-    svg += paths
-    svg += circles
-    svg += '</svg>'
+            parts.append('<tspan x="{}">{}</tspan><tspan class="pitch-small" x="{}" font-size="14">{}</tspan>'.format(
+                _num(x - 5), mor[0], _num(x + 12), mor[1]))
+    parts.append('</text>')
+    # One path, one subpath per segment: separate strokes like path(), without joins
+    if segments:
+        px, py, _ = segments[0]
+        d = 'm{},{}'.format(_num(px), _num(py)) + 'm0,0'.join(
+            ' {},{}'.format(STEP_WIDTH, _SEGMENT_DELTAS[typ]) for _, _, typ in segments)
+        parts.append(_COMPACT_LINE.format(d))
+    if n_mora:
+        parts.append('<g class="pitch-dot">')
+        parts.extend(_COMPACT_DOT.format(_num(x), _num(y)) for x, y in centers[:n_mora])
+        parts.append('</g>')
+    parts.extend(_COMPACT_END.format(_num(x), _num(y)) for x, y in centers[n_mora:])
+
+def render_svg(word, patt, style='card', mora=None):
+    """
+    SVG pitch diagram for reading word (kana) and pattern patt, memoized by
+    (hiragana, pattern, style) in the shared 'pitch_svg' cache. mora, if
+    given, is the reading already split by the pitch DB build: word is then
+    its normalized hiragana and patt one H/L per mora plus the particle, and
+    both are drawn as they are.
+    """
+    if style not in STYLES:
+        raise ValueError('unknown pitch diagram style: {}'.format(style))
+    if mora is None:
+        # If multiple patterns are present, use only the first
+        patt = str(patt)
+        if ',' in patt:
+            patt = patt.split(',')[0].strip()
+        # Always convert katakana to hiragana for mora splitting
+        word = katakana_to_hiragana(word)
+    # An aligned pattern draws the same diagram as the raw pattern it came
+    # from whenever the two are equal, so both share one cache key space
+    key = (word, patt, style)
+    cache = get_cache('pitch_svg')
+    svg = cache.get(key)
+    if svg is None:
+        svg = _build_svg(word, patt, style, mora)
+        cache.put(key, svg)
     return svg
 
+def render_many(pairs, style='card'):
+    """
+    SVGs for an iterable of (kana, pattern) pairs, in order; a pair may
+    carry the aligned mora as a third item (see render_svg). Each distinct
+    pair is rendered (or fetched from the cache) once per call, however
+    often it repeats, so batch field updates build each diagram once.
+    """
+    rendered = {}
+    result = []
+    for pair in pairs:
+        pair = tuple(pair)
+        svg = rendered.get(pair)
+        if svg is None:
+            svg = rendered[pair] = render_svg(pair[0], pair[1], style, *pair[2:])
+        result.append(svg)
+    return result
+
+def create_svg_pitch_pattern(word, patt):
+    return render_svg(word, patt)
+
 def create_html_pitch_pattern(reading, pattern):
     svg = create_svg_pitch_pattern(reading, pattern)
     return f'<div>{svg}</div>'
 
+# --- Pitch data fields ---
+# One kana:pattern item per diagram, separated by ';'. The kana are the
+# hiragana mora as drawn and the pattern has exactly one H or L per mora
+# plus one for the following particle, so the template script only has to
+# split mora and draw.
+_PITCH_DATA_RE = re.compile(r'^[ぁ-ゖー]+:[HL]+(?:;[ぁ-ゖー]+:[HL]+)*$')
+_TAG_RE = re.compile(r'<[^>]*>|&nbsp;|\s+')
+# Numeric pattern heights, as format_pitch_pattern maps them
+_DIGIT_HEIGHTS = str.maketrans('012', 'LHH')
+
+def pitch_data_item(kana, patt, mora=None):
+    """
+    The kana:pattern data item drawing the same diagram as render_svg(kana,
+    patt, mora=mora), or None if the reading has no kana (romaji, symbols),
+    which pitch data cannot hold.
+    """
+    if mora is not None:
+        return '{}:{}'.format(kana, patt) if mora else None
+    patt = str(patt)
+    if ',' in patt:
+        patt = patt.split(',')[0].strip()
+    mora = to_mora(kana)
+    if not mora:
+        return None
+    heights = ''.join(map(group_height, _pitch_groups(mora, patt)))
+    return '{}:{}'.format(''.join(mora), heights)
+
+def parse_pitch_data(field):
+    """
+    Return the (kana, pattern) pairs of a pitch data field, or None if the
+    field holds anything else (rendered SVG, an empty field). Markup the
+    editor may have added around the data is ignored.
+    """
+    text = _TAG_RE.sub('', field or '')
+    if not _PITCH_DATA_RE.match(text):
+        return None
+    return [tuple(item.split(':')) for item in text.split(';')]
+
+def _svg_field(svgs):
+    return ''.join(f'<div class="pitch-accent-block"><div>{svg}</div></div>' for svg in svgs)
+
+def pitch_fields(note_pairs, field_format=None, style=FIELD_STYLE):
+    """
+    pitch_accent field contents for a batch of notes, given the (kana,
+    pattern) pairs of each note (with the aligned mora as a third item
+    where the pitch DB provides them). field_format defaults to FIELD_FORMAT;
+    SVG fields are rendered with one render_many call for the whole batch.
+    """
+    field_format = field_format or FIELD_FORMAT
+    if field_format not in FIELD_FORMATS:
+        raise ValueError('unknown pitch field format: {}'.format(field_format))
+    note_pairs = [[tuple(pair) for pair in pairs] for pairs in note_pairs]
+    if field_format == 'data':
+        items = {}
+        for pairs in note_pairs:
+            for pair in pairs:
+                if pair not in items:
+                    items[pair] = pitch_data_item(*pair)
+        return [';'.join(items[pair] for pair in pairs if items[pair] is not None) for pairs in note_pairs]
+    svgs = iter(render_many((pair for pairs in note_pairs for pair in pairs), style=style))
+    return [_svg_field(next(svgs) for _ in pairs) for pairs in note_pairs]
+
+def pitch_field(pairs, field_format=None, style=FIELD_STYLE):
+    """pitch_accent field content for one note's (kana, pattern) pairs."""
+    return pitch_fields([pairs], field_format, style)[0]
+
+def render_pitch_field(field, style=FIELD_STYLE):
+    """Field HTML with pitch data drawn as SVG, the way the review template shows it."""
+    pairs = parse_pitch_data(field)
+    if pairs is None:
+        return field
+    return _svg_field(render_many(pairs, style=style))
+
 def extract_unique_pitch_patterns(entries):
     """
     Given a list of DB entries (each with 'kana' and 'pattern'),
     return a list of unique (hiragana_kana, pattern) pairs, splitting comma-separated patterns and deduplicating.
     Katakana readings are converted to hiragana before deduplication, so you only get one SVG per unique (hiragana, pattern) pair.
+    Entries with the pitch DB's aligned patterns ('aligned') yield those
+    instead, with their mora under 'mora', so nothing has to be split again.
     Order is preserved by first occurrence.
     """
     seen = set()
     result = []
     for entry in entries:
+        aligned = entry.get('aligned')
+        if aligned:
+            for hira, mora, heights, _number in aligned:
+                key = (hira, heights)
+                if key not in seen:
+                    seen.add(key)
+                    result.append({'kana': hira, 'pattern': heights, 'mora': mora})
+            continue
         kana = entry.get('kana')
         patterns = entry.get('pattern', '')
         for patt in [p.strip() for p in patterns.split(',') if p.strip()]:
@@ -175,3 +314,18 @@ def extract_unique_pitch_patterns(entries):
                 seen.add(key)
                 result.append({'kana': hira_kana, 'pattern': patt})
     return result
+
+def pitch_pairs(entries):
+    """
+    The (kana, pattern[, mora]) items render_many and pitch_fields take
+    for a word's DB entries, one per unique diagram. Raw patterns get the
+    card creator's digit mapping (0 -> L, 1/2 -> H); aligned ones already
+    have it.
+    """
+    pairs = []
+    for entry in extract_unique_pitch_patterns(entries):
+        if 'mora' in entry:
+            pairs.append((entry['kana'], entry['pattern'], entry['mora']))
+        else:
+            pairs.append((entry['kana'], entry['pattern'].translate(_DIGIT_HEIGHTS)))
+    return pairs
@@ -1,35 +1,15 @@
 from aqt.qt import *
 from aqt import mw
 from aqt.utils import showInfo
-from anki.notes import Note
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QProgressBar
-import os
-import sqlite3
-import json
 import re
+from .dictdata import lookup_jmdict, lookup_jmdict_many, get_reading_frequencies, katakana_reading
+from .deck_worker import DeckJobDialog
 
-ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(ADDON_DIR, 'data')
-JMDICT_SQLITE_PATH = os.path.join(DATA_DIR, 'JMdict_e_examp.sqlite')
-FREQ_SQLITE_PATH = os.path.join(DATA_DIR, 'japanese_word_frequencies.sqlite')
-
-# --- JMdict lookup (copied from __init__.py) ---
-def lookup_jmdict(word):
-    if not os.path.exists(JMDICT_SQLITE_PATH):
-        return []
-    try:
-        conn = sqlite3.connect(JMDICT_SQLITE_PATH)
-        c = conn.cursor()
-        c.execute('SELECT data FROM entries WHERE word=?', (word,))
-        row = c.fetchone()
-        conn.close()
-        if row:
-            return json.loads(row[0])
-    except Exception:
-        pass
-    return []
-
-class WordsWithTranslationsDialog(QDialog):
+# Notes per batched prefetch; small enough that a batch stays inside the caches
+PREFETCH_NOTES = 256
+
+class WordsWithTranslationsDialog(DeckJobDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Populate Words Fields with Translations")
@@ -60,7 +40,7 @@ class WordsWithTranslationsDialog(QDialog):
         btns.addWidget(self.cancel_btn)
         layout.addLayout(btns)
         self.ok_btn.clicked.connect(self.accept)
-        self.cancel_btn.clicked.connect(self.reject)
+        self.cancel_btn.clicked.connect(self.cancel)
 
     def accept(self):
         deck_name = self.deck_combo.currentText()
@@ -68,20 +48,31 @@ class WordsWithTranslationsDialog(QDialog):
         if not deck_id:
             showInfo("Please select a deck.")
             return
-        nids = mw.col.db.list("select nid from cards where did=?", deck_id)
-        total = len(set(nids))
-        updated = 0
-        for i, nid in enumerate(set(nids)):
-            note = mw.col.getNote(nid)
+        self.run_job(lambda col, report: self.note_updates(col, deck_id, report),
+                     lambda updated: showInfo(f"Updated {updated} notes in deck '{deck_name}'."))
+
+    def note_updates(self, col, deck_id, report):
+        # Runs in the DeckJob's background op: the deck's notes with new words fields, unsaved
+        nids = col.db.list("select nid from cards where did=?", deck_id)
+        # First pass: collect the notes to update and their words
+        jobs = []
+        for nid in set(nids):
+            note = col.get_note(nid)
             # Required fields: kanji, related_words, words, words_blank
             if not all(f in note for f in ("kanji", "related_words", "words", "words_blank")):
                 continue
-            kanji = note["kanji"].strip()
             related = note["related_words"]
             words = [w.strip() for w in related.replace('\n', ',').replace('、', ',').replace(';', ',').split(',') if w.strip()]
             if not words:
                 continue
-            selected_words = words[:4]
+            jobs.append((note, words[:4]))
+        total = len(jobs)
+        notes = []
+        for i, (note, selected_words) in enumerate(jobs):
+            # Look up the words of the next few hundred notes in one go
+            if i % PREFETCH_NOTES == 0:
+                self.prefetch([w for _note, ws in jobs[i:i + PREFETCH_NOTES] for w in ws])
+            kanji = note["kanji"].strip()
             words_lines = []
             words_blank_lines = []
             for w in selected_words:
@@ -104,18 +95,15 @@ class WordsWithTranslationsDialog(QDialog):
                 else:
                     blanked_with_furi = blanked
                 words_blank_lines.append(f'<div class="word-translation"><span class="word-jp">{blanked_with_furi}</span> - <span class="word-en">{translations_str}</span></div>')
-            note["words"] = '\n'.join(words_lines)
-            note["words_blank"] = '\n'.join(words_blank_lines)
-            note.flush()
-            updated += 1
-            # Update progress bar
-            if total > 0:
-                percent = int((i + 1) / total * 100)
-                self.progress.setValue(percent)
-                QApplication.processEvents()
-        mw.col.reset()
-        showInfo(f"Updated {updated} notes in deck '{deck_name}'.")
-        super().accept()
+            words_field = '\n'.join(words_lines)
+            words_blank_field = '\n'.join(words_blank_lines)
+            # Unchanged notes are not written again
+            if note["words"] != words_field or note["words_blank"] != words_blank_field:
+                note["words"] = words_field
+                note["words_blank"] = words_blank_field
+                notes.append(note)
+            report(i + 1, total)
+        return notes
 
     def get_furigana(self, word):
         # Extract furigana from word if present (e.g., 名前[なまえ])
@@ -133,33 +121,41 @@ class WordsWithTranslationsDialog(QDialog):
         return re.sub(r"\[.+?\]", "", word)
 
     def kana_to_katakana(self, text):
-        # Convert hiragana to katakana
-        return text.translate(str.maketrans(
-            'ぁあぃいぅうぇえぉおかがきぎくぐけげこごさざしじすずせぜそぞただちぢっつづてでとどなにぬねのはばぱひびぴふぶぷへべぺほぼぽまみむめもゃやゅゆょよらりるれろゎわゐゑをんゔゕゖ',
-            'ァアィイゥウェエォオカガキギクグケゲコゴサザシジスズセゼソゾタダチヂッツヅテデトドナニヌネノハバパヒビピフブプヘベペホボポマミムメモャヤュユョヨラリルレロヮワヰヱヲンヴヵヶ'))
+        # Convert hiragana to katakana, the same normalization as word_readings.reading_norm
+        return katakana_reading(text)
+
+    def prefetch(self, words):
+        # Fill the JMdict and frequency caches for all words with batched queries,
+        # so get_highest_frequency_entry only hits the caches afterwards
+        words = [self.strip_furigana(w) for w in words]
+        entries_by_word = lookup_jmdict_many(words)
+        pairs = []
+        for word, entries in entries_by_word.items():
+            for entry in entries:
+                for kana in entry.get('kanas', []):
+                    pairs.append((word, kana))
+        if pairs:
+            get_reading_frequencies(pairs)
 
     def get_highest_frequency_entry(self, word):
         entries = lookup_jmdict(self.strip_furigana(word))
         if not entries:
             return None, None
+        word = self.strip_furigana(word)
         best_entry = None
         best_reading = None
         best_freq = -1
         try:
-            conn = sqlite3.connect(FREQ_SQLITE_PATH)
-            c = conn.cursor()
+            # One indexed read fetches every reading of the word (none after prefetch)
+            freqs = get_reading_frequencies([(word, kana) for entry in entries for kana in entry.get('kanas', [])])
             for entry in entries:
                 kanas = entry.get('kanas', [])
                 for kana in kanas:
-                    katakana_kana = self.kana_to_katakana(kana)
-                    c.execute('SELECT frequency FROM word_readings WHERE word=? AND reading=?', (self.strip_furigana(word), katakana_kana))
-                    row = c.fetchone()
-                    freq = row[0] if row else -1
+                    freq = freqs.get((word, kana), -1)
                     if freq > best_freq:
                         best_freq = freq
                         best_entry = entry
                         best_reading = kana
-            conn.close()
         except Exception:
             pass
         if best_entry:
@@ -0,0 +1,96 @@
+# conftest.py
+# Sample data shared by the dictionary tests: tiny Wadoku and JMdict
+# exports, a helper to write them into a test's data directory and the
+# databases built from them in tmp_path. Also makes the add-on importable
+# as the japanese_word_creator package, the way Anki loads it, so modules
+# such as pitch_svg resolve their relative imports; the package __init__
+# (which needs Anki) is not run.
+
+import os
+import sys
+import importlib.util
+import pytest
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_PACKAGE = 'japanese_word_creator'
+
+if ADDON_PACKAGE not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        ADDON_PACKAGE, os.path.join(ADDON_DIR, '__init__.py'), submodule_search_locations=[ADDON_DIR])
+    sys.modules[ADDON_PACKAGE] = importlib.util.module_from_spec(_spec)
+
+from japanese_word_creator.dictdata import db_pool, dictdb
+from japanese_word_creator.dictdata.lookup_cache import invalidate
+
+WADOKU_SAMPLE = (
+    '\ufeffkanji␞kana␞accented␞number␞pattern\n'
+    '△飯␟飯␞いい␞いい␞1␞HLL\n'
+    '飯␟メシ␞めし␞め＼し␞2␞LHL\n'
+    '\n'
+    '可愛い␞かわいい␞かわいい␞3␞LHHLL\n'
+)
+
+JMDICT_SAMPLE = '''<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE JMdict [
+<!ENTITY n "noun (common) (futsuumeishi)">
+]>
+<JMdict>
+<entry><ent_seq>1</ent_seq><k_ele><keb>秋</keb></k_ele><r_ele><reb>あき</reb></r_ele>
+<sense><pos>&n;</pos><gloss>autumn</gloss><gloss>fall</gloss></sense></entry>
+<entry><ent_seq>2</ent_seq><r_ele><reb>あき</reb></r_ele>
+<sense><gloss>vacancy</gloss></sense><sense><gloss>gap</gloss></sense><sense><pos>&n;</pos></sense></entry>
+</JMdict>
+'''
+
+
+def _write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+@pytest.fixture
+def wadoku_sample():
+    """wadoku_pitchdb.csv text: 飯 (two readings, one repeated) and 可愛い."""
+    return WADOKU_SAMPLE
+
+
+@pytest.fixture
+def jmdict_sample():
+    """JMdict XML text: 秋 and a kana-only あき entry."""
+    return JMDICT_SAMPLE
+
+
+@pytest.fixture
+def write_file():
+    """write_file(path, text) writes text to path as UTF-8."""
+    return _write
+
+
+@pytest.fixture
+def pitch_db(tmp_path):
+    """
+    Path of wadoku_pitchdb.sqlite built in tmp_path from WADOKU_SAMPLE,
+    which is left next to it as wadoku_pitchdb.csv.
+    """
+    csv_path = os.path.join(tmp_path, 'wadoku_pitchdb.csv')
+    db_path = os.path.join(tmp_path, 'wadoku_pitchdb.sqlite')
+    _write(csv_path, WADOKU_SAMPLE)
+    dictdb.build_pitch_db(csv_path, db_path)
+    yield db_path
+    invalidate()
+    db_pool.close_all()
+
+
+@pytest.fixture
+def jmdict_db(tmp_path):
+    """
+    Path of JMdict_e_examp.sqlite built in tmp_path from JMDICT_SAMPLE,
+    which is left next to it as JMdict_e_examp.XML.
+    """
+    xml_path = os.path.join(tmp_path, 'JMdict_e_examp.XML')
+    db_path = os.path.join(tmp_path, 'JMdict_e_examp.sqlite')
+    _write(xml_path, JMDICT_SAMPLE)
+    dictdb.ensure_jmdict_db(xml_path, os.path.join(tmp_path, 'JMdict_e_examp.json'), db_path)
+    yield db_path
+    invalidate()
+    db_pool.close_all()
@@ -0,0 +1,46 @@
+# test_bloom.py
+# Bloom filter negative cache: no false negatives, a false-positive rate
+# near the target, and filters that go stale when their DB changes
+
+import sys
+import os
+import sqlite3
+import pytest
+# Sets up the add-on package, also when this is run as a script
+import conftest  # noqa: F401
+from japanese_word_creator.dictdata import bloom, db_pool, dictdb
+
+
+def test_no_false_negatives_and_measured_false_positive_rate(tmp_path):
+    path = os.path.join(tmp_path, 'words.bloom')
+    keys = ['語{}'.format(i) for i in range(20000)]
+    assert bloom.build_bloom(keys, len(keys), path) == len(keys)
+    f = bloom.BloomFilter(path)
+    try:
+        assert all(k in f for k in keys)
+        rate = bloom.measure_false_positive_rate(f, ('無{}'.format(i) for i in range(20000)))
+        assert rate < 2 * bloom.DEFAULT_ERROR_RATE, rate
+    finally:
+        f.close()
+
+
+def test_pitch_db_filter_is_built_and_goes_stale(pitch_db):
+    assert not dictdb.key_filter_needs_build(pitch_db)
+    f = db_pool.get_key_filter(pitch_db)
+    assert '飯' in f and 'めし' in f
+    assert 'の' not in f
+    db_pool.close_all()
+    # Any change to the DB file makes the filter unusable until rebuilt
+    conn = sqlite3.connect(pitch_db)
+    conn.execute("INSERT INTO pitch_accents (kanji, kana) VALUES ('の', 'の')")
+    conn.commit()
+    conn.close()
+    assert dictdb.key_filter_needs_build(pitch_db)
+    assert db_pool.get_key_filter(pitch_db) is None
+    db_pool.close_all()
+    dictdb.build_key_filter(pitch_db, dictdb.PITCH_KEYS_SQL)
+    assert 'の' in db_pool.get_key_filter(pitch_db)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
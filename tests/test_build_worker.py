@@ -0,0 +1,56 @@
+# test_build_worker.py
+# Runs the first-run build worker as a subprocess on sample data and checks
+# its progress stream and the databases it leaves behind
+
+import sys
+import os
+import json
+import sqlite3
+import subprocess
+import pytest
+# Sets up the add-on package, also when this is run as a script
+import conftest  # noqa: F401
+from japanese_word_creator.dictdata import build_worker, dictdb
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_worker_builds_missing_dbs_and_streams_progress(wadoku_sample, jmdict_sample, write_file, tmp_path):
+    write_file(os.path.join(tmp_path, 'wadoku_pitchdb.csv'), wadoku_sample)
+    write_file(os.path.join(tmp_path, 'JMdict_e_examp.XML'), jmdict_sample)
+    conn = sqlite3.connect(os.path.join(tmp_path, 'japanese_word_frequencies.sqlite'))
+    conn.execute('CREATE TABLE word_readings (word TEXT, reading TEXT, frequency INTEGER, PRIMARY KEY (word, reading))')
+    conn.execute("INSERT INTO word_readings VALUES ('秋', 'アキ', 120)")
+    conn.commit()
+    conn.close()
+    assert build_worker.pending_steps(tmp_path) == ['pitch', 'jmdict', 'frequency']
+    proc = subprocess.run([sys.executable, '-m', 'dictdata.build_worker', '--data-dir', str(tmp_path), '--memory-mb', '512'],
+                          capture_output=True, text=True, cwd=ADDON_DIR)
+    assert proc.returncode == 0, proc.stderr
+    events = [json.loads(line) for line in proc.stdout.splitlines() if line.startswith('{')]
+    assert events[0] == {'event': 'start', 'steps': ['pitch', 'jmdict', 'frequency']}
+    assert events[-1] == {'event': 'finished'}
+    assert {'event': 'progress', 'step': 'pitch', 'rows': 5} in events
+    assert [e['step'] for e in events if e['event'] == 'done'] == ['pitch', 'jmdict', 'frequency']
+    assert build_worker.pending_steps(tmp_path) == []
+    conn = sqlite3.connect(os.path.join(tmp_path, 'JMdict_e_examp.sqlite'))
+    assert dictdb.jmdict_entries(conn, '秋')[0]['meanings'] == ['autumn; fall']
+    conn.close()
+
+
+def test_deferred_builds_are_left_to_the_worker(wadoku_sample, write_file, tmp_path):
+    csv_path = os.path.join(tmp_path, 'wadoku_pitchdb.csv')
+    db_path = os.path.join(tmp_path, 'wadoku_pitchdb.sqlite')
+    write_file(csv_path, wadoku_sample)
+    dictdb.defer_builds(True)
+    try:
+        dictdb.ensure_pitch_db(csv_path, db_path)
+        assert not os.path.exists(db_path)
+    finally:
+        dictdb.defer_builds(False)
+    dictdb.ensure_pitch_db(csv_path, db_path)
+    assert os.path.exists(db_path)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,75 @@
+# test_card_template.py
+# Compiled card templates: the same output as the str.replace chain they
+# replace, Anki's furigana filters and conditional sections
+
+import sys
+import os
+import pytest
+# Sets up the add-on package, also when this is run as a script
+import conftest  # noqa: F401
+from japanese_word_creator.card_template import compile_template, furigana, kana, kanji, read_review_templates
+
+TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'card_templates')
+
+FIELDS = {
+    'word': '可愛い',
+    'reading': 'かわいい',
+    'meanings': '<div class="meaning-block">cute</div>',
+    'example sentences': '',
+    'pitch_accent': '<svg class="pitch"></svg>',
+    'kanji_info': "<div class='kanji-block'>可</div>",
+}
+
+
+def _read(*parts):
+    with open(os.path.join(TEMPLATES, *parts), encoding='utf-8') as f:
+        return f.read()
+
+
+def test_render_matches_replace_chain():
+    for name in ('front_card.html', 'back_card.html'):
+        source = _read('review', name)
+        replaced = source
+        for field, value in FIELDS.items():
+            replaced = replaced.replace('{{' + field + '}}', value)
+        assert compile_template(source).render(FIELDS) == replaced
+
+
+def test_furigana_filters():
+    text = '日本語[にほんご]を 勉強[べんきょう]する&nbsp;[sound:a.mp3]'
+    assert furigana(text) == (
+        '<ruby><rb>日本語</rb><rt>にほんご</rt></ruby>を<ruby><rb>勉強</rb><rt>べんきょう</rt></ruby>する [sound:a.mp3]')
+    assert kanji(text) == '日本語を勉強する [sound:a.mp3]'
+    assert kana(text) == 'にほんごをべんきょうする [sound:a.mp3]'
+    template = compile_template('<div>{{furigana:words}}</div>{{kana:words}}')
+    assert template.render({'words': '秋[あき]'}) == '<div><ruby><rb>秋</rb><rt>あき</rt></ruby></div>あき'
+
+
+def test_sections_and_kanji_template():
+    template = compile_template('{{radical}}{{#radical_reading}}（{{radical_reading}}）{{/radical_reading}}'
+                                '{{^meaning}}-{{/meaning}}')
+    assert template.render({'radical': '口', 'radical_reading': 'くち'}) == '口（くち）-'
+    assert template.render({'radical': '口', 'radical_reading': '<br> ', 'meaning': 'mouth'}) == '口'
+    html = compile_template(_read('kanji', 'back_card.html')).render({'words': '秋[あき]', 'radical': '禾'})
+    assert '<ruby><rb>秋</rb><rt>あき</rt></ruby>' in html
+    assert '{{' not in html
+    try:
+        compile_template('{{#a}}x')
+        assert False, 'unclosed section should not compile'
+    except ValueError:
+        pass
+
+
+def test_shipped_review_templates_render():
+    front, back, css = read_review_templates()
+    assert css.strip()
+    front_html = compile_template(front).render(FIELDS)
+    back_html = compile_template(back).render(FIELDS)
+    assert '可愛い' in front_html
+    for value in FIELDS.values():
+        assert value in back_html
+    assert '{{' not in front_html and '{{' not in back_html
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,177 @@
+# test_dictdb.py
+# Builds tiny pitch/JMdict databases from inline samples and checks lookups
+
+import sys
+import os
+import json
+import sqlite3
+import pytest
+import threading
+# Sets up the add-on package, also when this is run as a script
+import conftest  # noqa: F401
+from japanese_word_creator.dictdata import dictdb, db_pool
+
+def test_build_pitch_db(wadoku_sample, write_file, tmp_path):
+    csv_path = os.path.join(tmp_path, 'wadoku_pitchdb.csv')
+    db_path = os.path.join(tmp_path, 'wadoku_pitchdb.sqlite')
+    write_file(csv_path, wadoku_sample)
+    stats = dictdb.build_pitch_db(csv_path, db_path, batch_size=2)
+    assert stats['rows'] == 5
+    assert not os.path.exists(db_path + '.tmp')
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('SELECT kanji, kana, pattern FROM pitch_accents WHERE kanji=?', ('飯',)).fetchall()
+    assert rows == [('飯', 'いい', 'HLL'), ('飯', 'いい', 'HLL'), ('飯', 'めし', 'LHL')]
+    indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    assert {'idx_pitch_kanji', 'idx_pitch_kana'} <= indexes
+    conn.close()
+
+
+def test_pitch_rows_keep_the_first_row_after_a_byte_order_mark(write_file, tmp_path):
+    csv_path = os.path.join(tmp_path, 'wadoku_pitchdb.csv')
+    write_file(csv_path, '\ufeff飯␞めし␞め＼し␞2␞LHL\n可愛い␞かわいい␞かわいい␞3␞LHHLL\n')
+    assert [row[0] for row in dictdb.iter_pitch_rows(csv_path)] == ['飯', '可愛い']
+    write_file(csv_path, '\ufeffkanji␞kana␞accented␞number␞pattern\n飯␞めし␞め＼し␞2␞LHL\n')
+    assert list(dictdb.iter_pitch_rows(csv_path)) == [('飯', 'めし', 'め＼し', '2', 'LHL')]
+
+
+def test_build_jmdict_db_from_xml(jmdict_db):
+    conn = sqlite3.connect(jmdict_db)
+    assert dictdb.jmdict_entries(conn, 'あき') == [
+        {'kanjis': ['秋'], 'kanas': ['あき'], 'meanings': ['autumn; fall']},
+        {'kanjis': [], 'kanas': ['あき'], 'meanings': ['vacancy', 'gap']},
+    ]
+    assert dictdb.jmdict_entries(conn, '秋') == [
+        {'kanjis': ['秋'], 'kanas': ['あき'], 'meanings': ['autumn; fall']},
+    ]
+    assert dictdb.jmdict_entries(conn, 'の') == []
+    assert dictdb.jmdict_db_complete(conn)
+    assert conn.execute("SELECT value FROM meta WHERE key = 'entries'").fetchone() == ('2',)
+    conn.close()
+
+
+def test_legacy_jmdict_db_is_migrated(tmp_path):
+    db_path = os.path.join(tmp_path, 'JMdict_e_examp.sqlite')
+    autumn = {'kanjis': ['秋'], 'kanas': ['あき'], 'meanings': ['autumn; fall']}
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE entries (word TEXT PRIMARY KEY, data TEXT)')
+    conn.execute('INSERT INTO entries VALUES (?, ?)', ('秋', json.dumps([autumn], ensure_ascii=False)))
+    conn.execute('INSERT INTO entries VALUES (?, ?)', ('あき', json.dumps([autumn], ensure_ascii=False)))
+    conn.commit()
+    conn.close()
+    dictdb.ensure_jmdict_db(os.path.join(tmp_path, 'missing.XML'), os.path.join(tmp_path, 'missing.json'), db_path)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == dictdb.JMDICT_SCHEMA_VERSION
+    assert dictdb.jmdict_entries(conn, 'あき') == [autumn]
+    conn.close()
+
+
+def test_batched_lookups_match_single_lookups(pitch_db, jmdict_db):
+    words = ['飯', 'めし', 'かわいい', '可愛い', 'あき', '秋', 'の', '飯']
+    conn = sqlite3.connect(pitch_db)
+    batched = dictdb.pitch_entries_many(conn, words)
+    assert batched == {w: dictdb.pitch_entries(conn, w) for w in words}
+    assert [e['kana'] for e in batched['飯']] == ['いい', 'いい', 'めし']
+    conn.close()
+    conn = sqlite3.connect(jmdict_db)
+    batched = dictdb.jmdict_entries_many(conn, words)
+    assert batched == {w: dictdb.jmdict_entries(conn, w) for w in words}
+    conn.close()
+
+
+def test_frequency_tables(tmp_path):
+    db_path = os.path.join(tmp_path, 'japanese_word_frequencies.sqlite')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE word_readings (word TEXT, reading TEXT, frequency INTEGER, PRIMARY KEY (word, reading))')
+    conn.executemany('INSERT INTO word_readings VALUES (?, ?, ?)', [
+        ('秋', 'アキ', 120), ('秋', 'シュウ', 7), ('今日', 'きょう', 300), ('今日', 'コンニチ', 12), ('謎', 'ナゾ', None),
+    ])
+    conn.commit()
+    words = ['秋', '今日', '謎', '無い']
+    # Before the upgrade the lookups fall back to scanning readings
+    legacy = ([dictdb.max_frequency(conn, w) for w in words], dictdb.max_frequencies_many(conn, words),
+              dictdb.reading_frequencies(conn, '今日'), dictdb.reading_frequencies_many(conn, words))
+    conn.close()
+    dictdb.ensure_frequency_db(db_path)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == dictdb.FREQUENCY_SCHEMA_VERSION
+    assert [dictdb.max_frequency(conn, w) for w in words] == [(120, 'アキ'), (300, 'きょう'), (0, None), (0, None)]
+    assert dictdb.max_frequencies_many(conn, words) == {'秋': 120, '今日': 300, '謎': 0, '無い': 0}
+    assert dictdb.reading_frequencies(conn, '今日') == {'キョウ': 300, 'コンニチ': 12}
+    assert ([dictdb.max_frequency(conn, w) for w in words], dictdb.max_frequencies_many(conn, words),
+            dictdb.reading_frequencies(conn, '今日'), dictdb.reading_frequencies_many(conn, words)) == legacy
+    conn.close()
+
+
+def test_pitch_patterns_are_aligned_at_build_time(wadoku_sample, write_file, tmp_path):
+    csv_path = os.path.join(tmp_path, 'wadoku_pitchdb.csv')
+    db_path = os.path.join(tmp_path, 'wadoku_pitchdb.sqlite')
+    # 東京 has four mora but only three heights
+    write_file(csv_path, wadoku_sample + '東京␞トウキョウ␞とうきょう␞0,2␞LHH,LHLLL\n')
+    stats = dictdb.build_pitch_db(csv_path, db_path)
+    assert stats['misaligned'] == 1
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == dictdb.PITCH_SCHEMA_VERSION
+    assert dictdb.pitch_entries(conn, '可愛い')[0]['aligned'] == (('かわいい', ('か', 'わ', 'い', 'い'), 'LHHLL', 3),)
+    assert dictdb.pitch_entries(conn, '東京')[0]['aligned'] == (
+        ('とうきょう', ('と', 'う', 'きょ', 'う'), 'LHHHH', 0),
+        ('とうきょう', ('と', 'う', 'きょ', 'う'), 'LHLLL', 2))
+    assert dictdb.misaligned_pitch_patterns(conn) == [('東京', 'トウキョウ', 'LHH,LHLLL', 0, 'LHHHH', 'padded')]
+    # A DB built before pitch_pattern is upgraded in place, without the CSV
+    conn.execute('DROP TABLE pitch_pattern')
+    conn.execute('PRAGMA user_version=0')
+    conn.commit()
+    conn.close()
+    assert dictdb.pitch_tables_need_build(db_path)
+    assert 'aligned' not in dictdb.pitch_entries(sqlite3.connect(db_path), '可愛い')[0]
+    dictdb.ensure_pitch_db(os.path.join(tmp_path, 'missing.csv'), db_path)
+    assert not dictdb.pitch_tables_need_build(db_path)
+    conn = sqlite3.connect(db_path)
+    assert len(dictdb.misaligned_pitch_patterns(conn)) == 1
+    assert dictdb.pitch_entries(conn, '可愛い')[0]['aligned'][0][2] == 'LHHLL'
+    conn.close()
+
+
+def test_pooled_connection_is_reused_and_reset_by_rebuild(wadoku_sample, write_file, tmp_path):
+    csv_path = os.path.join(tmp_path, 'wadoku_pitchdb.csv')
+    db_path = os.path.join(tmp_path, 'ピッチ.sqlite')
+    write_file(csv_path, wadoku_sample)
+    dictdb.build_pitch_db(csv_path, db_path)
+    conn = db_pool.get_connection(db_path)
+    assert db_pool.get_connection(db_path) is conn
+    assert conn.execute('SELECT count(*) FROM pitch_accents').fetchone()[0] == 5
+    try:
+        conn.execute("INSERT INTO pitch_accents (kanji) VALUES ('x')")
+        assert False, 'pooled connection should be read-only'
+    except sqlite3.OperationalError:
+        pass
+    write_file(csv_path, wadoku_sample.split('\n\n')[0] + '\n')
+    dictdb.build_pitch_db(csv_path, db_path)
+    conn = db_pool.get_connection(db_path)
+    assert conn.execute('SELECT count(*) FROM pitch_accents').fetchone()[0] == 4
+    db_pool.close_all()
+
+
+def test_close_all_leaves_other_threads_connections_to_them(pitch_db):
+    conn = db_pool.get_connection(pitch_db)
+    # close_all from another thread (a build) only marks the pool stale
+    other = threading.Thread(target=db_pool.close_all)
+    other.start()
+    other.join()
+    assert conn.execute('SELECT count(*) FROM pitch_accents').fetchone()[0] == 5
+    assert db_pool.get_connection(pitch_db) is not conn
+    try:
+        conn.execute('SELECT 1')
+        assert False, 'stale connection should be closed by its own thread'
+    except sqlite3.ProgrammingError:
+        pass
+    # Paused, nothing is kept open
+    db_pool.pause_pool(True)
+    try:
+        assert db_pool.get_connection(pitch_db) is not db_pool.get_connection(pitch_db)
+        assert db_pool.get_key_filter(pitch_db) is None
+    finally:
+        db_pool.pause_pool(False)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
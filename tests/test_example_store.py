@@ -0,0 +1,42 @@
+# test_example_store.py
+# JSON migration, reads and single-row upserts of the example sentence store
+
+import sys
+import os
+import pytest
+import json
+# Sets up the add-on package, also when this is run as a script
+import conftest  # noqa: F401
+from japanese_word_creator.dictdata import example_store
+
+LEGACY = {
+    '漢字': {'examples': [['漢字で書く', 'write in kanji']], 'related_words': [['常用漢字', 'everyday kanji']]},
+    '秋': {'examples': [], 'related_words': []},
+}
+
+
+def test_migrates_json_once_and_upserts(tmp_path):
+    db_path = os.path.join(tmp_path, 'kanji_examples.sqlite')
+    json_path = os.path.join(tmp_path, 'kanji_examples.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(LEGACY, f, ensure_ascii=False)
+    conn = example_store.open_store(db_path, json_path)
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    conn.close()
+    # Later edits to the JSON are not migrated again
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'春': {'examples': [], 'related_words': []}}, f)
+    assert example_store.get_examples('漢字', db_path) == (
+        [['漢字で書く', 'write in kanji']], [['常用漢字', 'everyday kanji']])
+    assert example_store.get_examples('秋', db_path) == ([], [])
+    assert example_store.get_examples('春', db_path) is None
+    example_store.put_examples('春', [('春が来た', 'Spring has come')], [], db_path)
+    example_store.put_examples('秋', [('秋の空', 'autumn sky')], [], db_path)
+    example_store.close_store()
+    assert example_store.get_examples('春', db_path) == ([['春が来た', 'Spring has come']], [])
+    assert example_store.get_examples('秋', db_path) == ([['秋の空', 'autumn sky']], [])
+    example_store.close_store()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,76 @@
+# test_import_budget.py
+# Importing the add-on must stay cheap: no data builds, dataset loads or
+# network libraries at import time, and a fixed time budget.
+
+import sys
+import os
+import json
+import subprocess
+import importlib.util
+import pytest
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ADDON_DIR, 'data')
+
+# Milliseconds the imports below may take in a fresh interpreter
+IMPORT_BUDGET_MS = 250
+
+# Modules that must only be imported on first use
+HEAVY_MODULES = ['requests', 'bs4', 'sentence_lookup']
+
+# Imports the Qt-free dictdata package, or the whole add-on package when Anki is
+# available, and reports the time taken and what got loaded
+PROBE = '''
+import importlib, importlib.util, json, sys, time
+addon_dir, full = sys.argv[1], sys.argv[2] == '1'
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location(
+    'japanese_word_creator', addon_dir + '/__init__.py', submodule_search_locations=[addon_dir])
+module = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = module
+if full:
+    spec.loader.exec_module(module)
+else:
+    # Only the package entry, as conftest.py sets it up, without Anki
+    importlib.import_module('japanese_word_creator.dictdata')
+lookups = sys.modules['japanese_word_creator.dictdata.lookups']
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({
+    'ms': elapsed,
+    'modules': sorted(m for m in sys.modules if m.split('.')[-1] in %r),
+    'kanji_info_loaded': lookups.kanji_info_index.loaded(),
+}))
+''' % (HEAVY_MODULES,)
+
+
+def _probe(full):
+    out = subprocess.run(
+        [sys.executable, '-c', PROBE, ADDON_DIR, '1' if full else '0'],
+        capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _check(full):
+    before = sorted(os.listdir(DATA_DIR))
+    result = _probe(full)
+    assert result['modules'] == [], 'imported at load time: {}'.format(result['modules'])
+    assert not result['kanji_info_loaded'], 'kanji info loaded at import time'
+    assert sorted(os.listdir(DATA_DIR)) == before, 'data files written at import time'
+    assert result['ms'] < IMPORT_BUDGET_MS, 'import took {:.0f} ms (budget {} ms)'.format(result['ms'], IMPORT_BUDGET_MS)
+
+
+def test_lookup_modules_import_budget():
+    _check(full=False)
+
+
+def test_addon_import_budget():
+    # The full package needs Anki; only checked where it is installed
+    pytest.importorskip('aqt')
+    _check(full=True)
+
+
+if __name__ == "__main__":
+    test_lookup_modules_import_budget()
+    if importlib.util.find_spec('aqt') is not None:
+        test_addon_import_budget()
+    print("import budget tests passed")
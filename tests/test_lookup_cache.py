@@ -0,0 +1,35 @@
+# test_lookup_cache.py
+# Eviction order, counters and invalidation of the shared lookup caches
+
+import sys
+import pytest
+# Sets up the add-on package, also when this is run as a script
+import conftest  # noqa: F401
+from japanese_word_creator.dictdata.lookup_cache import LRUCache, get_cache, invalidate, cache_stats
+
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache('test', maxsize=2)
+    cache.put('秋', 1)
+    cache.put('春', 2)
+    assert cache.get('秋') == 1  # 秋 is now most recently used
+    cache.put('夏', 3)           # evicts 春
+    assert cache.get('春') is None
+    assert cache.get('夏') == 3
+    assert cache.stats() == {'size': 2, 'maxsize': 2, 'hits': 2, 'misses': 1, 'evictions': 1}
+
+
+def test_registry_and_invalidate():
+    cache = get_cache('test_registry', maxsize=8)
+    assert get_cache('test_registry') is cache
+    cache.put('飯', [])
+    assert cache_stats()['test_registry']['size'] == 1
+    invalidate('test_registry')
+    assert cache.get('飯') is None
+    cache.put('飯', [])
+    invalidate()
+    assert len(cache) == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -2,53 +2,17 @@
 # Standalone test for pitch accent SVG generation for 原子力
 
 import sys
-import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import re
 import json
-import sqlite3
-from pitch_svg import hira_to_mora, create_svg_pitch_pattern, create_html_pitch_pattern
-
-# --- Minimal lookup_pitch_accent (copied from __init__.py, no relative imports) ---
-ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(ADDON_DIR, 'data')
-PITCH_DB_SQLITE_PATH = os.path.join(DATA_DIR, 'wadoku_pitchdb.sqlite')
-
-_pitch_accent_cache = {}
-def lookup_pitch_accent(word):
-    if word in _pitch_accent_cache:
-        return _pitch_accent_cache[word]
-    if not os.path.exists(PITCH_DB_SQLITE_PATH):
-        return [], '', [], ''
-    entries = []
-    try:
-        conn = sqlite3.connect(PITCH_DB_SQLITE_PATH)
-        c = conn.cursor()
-        if len(word) == 1 and '\u4e00' <= word <= '\u9fff':
-            c.execute('SELECT kana, accented_kana, pitch_number, pattern FROM pitch_accents WHERE kanji=?', (word,))
-        else:
-            c.execute('SELECT kana, accented_kana, pitch_number, pattern FROM pitch_accents WHERE kanji=? OR kana=?', (word, word))
-        for row in c.fetchall():
-            kana, accented_kana, pitch_number, pattern = row
-            pitch_entry = {
-                "kana": kana,
-                "accented_kana": accented_kana,
-                "pitch_number": pitch_number,
-                "pattern": pattern
-            }
-            entries.append(pitch_entry)
-        conn.close()
-    except Exception:
-        pass
-    if not entries:
-        result = ([], '', [], '')
-    else:
-        accented_kanas = list({e["accented_kana"] for e in entries if e["accented_kana"]})
-        pitch_patterns = [e["pattern"] for e in entries]
-        normal_kanas = list({e["kana"] for e in entries if e["kana"]})
-        result = (accented_kanas, accented_kanas[0] if accented_kanas else '', pitch_patterns, normal_kanas[0] if normal_kanas else '')
-    _pitch_accent_cache[word] = result
-    return result
+import xml.etree.ElementTree as ET
+import pytest
+# Sets up the add-on package, also when this is run as a script
+import conftest  # noqa: F401
+from japanese_word_creator.pitch_svg import (
+    hira_to_mora, create_svg_pitch_pattern, create_html_pitch_pattern, render_svg, render_many,
+    pitch_fields, pitch_data_item, parse_pitch_data, renders_pitch_data, check_field_format, render_pitch_field, to_mora, to_mora_many, pitch_pairs)
+from japanese_word_creator.dictdata import lookup_pitch_accent, get_cache
+from japanese_word_creator.card_template import read_review_templates
 
 # --- Test logic ---
 def test_pitch_svg_for_genshiryoku():
@@ -90,5 +54,100 @@ def test_pitch_svg_for_genshiryoku():
         html = create_html_pitch_pattern(kana_hira, pattern)
         print(f"HTML:\n{html}\n")
 
+def test_mora_tokenizer():
+    assert to_mora('ちゅうごく') == ['ちゅ', 'う', 'ご', 'く']
+    # Katakana is split natively, small ェ included, and comes out as hiragana
+    assert to_mora('チェーン') == to_mora('ちぇーん') == ['ちぇ', 'ー', 'ん']
+    assert to_mora('<b>き・ょう</b>') == ['きょ', 'う']
+    assert to_mora('') == []
+    assert to_mora_many(['サラダ', 'めし', 'サラダ']) == [['さ', 'ら', 'だ'], ['め', 'し'], ['さ', 'ら', 'だ']]
+    assert hira_to_mora('きょう') == ['きょ', 'う']
+
+def test_render_many_renders_each_pair_once():
+    cache = get_cache('pitch_svg')
+    cache.clear()
+    pairs = [('めし', 'HLL'), ('サラダ', 'HLLL'), ('めし', 'HLL'), ('さらだ', 'HLLL')]
+    svgs = render_many(pairs)
+    assert svgs == [create_svg_pitch_pattern(k, p) for k, p in pairs]
+    # Katakana and hiragana readings share one diagram
+    assert svgs[1] == svgs[3]
+    assert len(cache) == 2
+    panel = render_svg('めし', 'HLL', style='panel')
+    assert panel != svgs[0] and panel.count('<rect') == 1
+    assert render_svg('めし', 'HLL,LHH') == svgs[0]
+    assert len(cache) == 3
+
+def _drawn(svg):
+    # What a diagram draws: (x, y, font size, kana) texts, (x, y, dx, dy) strokes, (x, y, open) dots
+    root = ET.fromstring(svg)
+    texts, strokes, dots = [], [], []
+    for el in root.iter():
+        size = re.search(r'font-size:(\d+)', el.get('style', ''))
+        if el.tag == 'text' and el.text:
+            texts.append((float(el.get('x')), float(el.get('y')), int(size.group(1)) if size else 20, el.text))
+        elif el.tag == 'tspan':
+            texts.append((float(el.get('x')), float(root.find('text').get('y')), int(el.get('font-size', 20)), el.text))
+        elif el.tag == 'path':
+            nums = [float(n) for n in re.findall(r'-?[\d.]+', el.get('d'))]
+            x, y = nums[0], nums[1]
+            for i in range(2, len(nums), 4):
+                strokes.append((x, y, nums[i], nums[i + 1]))
+                x, y = x + nums[i], y + nums[i + 1]
+        elif el.tag == 'circle':
+            dots.append((float(el.get('cx')), float(el.get('cy')), '#fff' in el.get('style', el.get('fill', ''))))
+    return sorted(texts), strokes, dots
+
+def test_compact_svg_draws_the_same_in_fewer_bytes():
+    for kana, pattern in [('ちゅうごく', 'LlHHH'), ('かわいい', 'LHHHH'), ('めし', 'HLL'), ('あ', 'LH'), ('サラダ', 'HLLL')]:
+        card = render_svg(kana, pattern)
+        compact = render_svg(kana, pattern, style='compact')
+        assert _drawn(compact) == _drawn(card), kana
+        # The shared styling pays for itself from two mora on
+        if len(kana) > 1:
+            assert len(compact) < len(card), kana
+        assert 'style=' not in compact.split('>', 1)[1]
+
+def test_review_css_styles_the_compact_markup():
+    # Compact diagrams leave their styling to the note type's CSS
+    _front, _back, css = read_review_templates()
+    field = pitch_fields([[('ちゅうごく', 'LlHHH'), ('あ', 'LH')]], 'svg', 'compact')[0]
+    for name in set(re.findall(r'class="([^"]+)"', field)):
+        assert re.search(r'\.{}\b(?!-)'.format(re.escape(name)), css), name
+
+def test_pitch_data_fields_render_like_svg_fields():
+    notes = [[('ちゅうごく', 'LlHHH'), ('サラダ', 'HLLL')], [('めし', 'HLL,LHH')], []]
+    data = pitch_fields(notes, 'data')
+    assert data == ['ちゅうごく:LLHHH;さらだ:HLLL', 'めし:HLL', '']
+    assert parse_pitch_data('<div>めし:HLL&nbsp;</div>') == [('めし', 'HLL')]
+    assert parse_pitch_data('') is None
+    svgs = pitch_fields(notes, 'svg', 'compact')
+    assert parse_pitch_data(svgs[0]) is None
+    assert [render_pitch_field(f, 'compact') for f in data] == svgs
+    # Readings without kana have no data item, and the rest still parse
+    assert pitch_data_item('ABC', 'HLL') is None
+    data = pitch_fields([[('ABC', 'HLL'), ('めし', 'HLL')], [('ＣＤ', 'LH')]], 'data')
+    assert data == ['めし:HLL', '']
+    assert parse_pitch_data(data[0]) == [('めし', 'HLL')]
+
+def test_only_note_types_with_the_script_take_pitch_data():
+    front, back, _css = read_review_templates()
+    shipped = {'name': 'JapaneseWordAuto', 'tmpls': [{'qfmt': front, 'afmt': back}]}
+    empty = {'name': 'Basic', 'tmpls': [{'qfmt': '{{Front}}', 'afmt': '{{Back}}'}]}
+    assert renders_pitch_data(shipped)
+    assert not renders_pitch_data(empty)
+    check_field_format(shipped, 'data')
+    check_field_format(empty, 'svg')
+    with pytest.raises(ValueError):
+        check_field_format(empty, 'data')
+
+def test_aligned_patterns_draw_like_raw_patterns():
+    # The same rows with and without the pitch DB's pre-aligned patterns
+    raw = [{'kana': 'チュウゴク', 'pattern': 'LlHHH'}, {'kana': 'めし', 'pattern': 'HLL,LHH'}]
+    aligned = [dict(raw[0], aligned=(('ちゅうごく', ('ちゅ', 'う', 'ご', 'く'), 'LLHHH', 0),)),
+               dict(raw[1], aligned=(('めし', ('め', 'し'), 'HLL', 1), ('めし', ('め', 'し'), 'LHH', 0)))]
+    assert pitch_pairs(aligned)[0] == ('ちゅうごく', 'LLHHH', ('ちゅ', 'う', 'ご', 'く'))
+    for field_format, style in (('svg', 'card'), ('svg', 'compact'), ('data', None)):
+        assert pitch_fields([pitch_pairs(aligned)], field_format, style) == pitch_fields([pitch_pairs(raw)], field_format, style)
+
 if __name__ == "__main__":
-    test_pitch_svg_for_genshiryoku()
+    sys.exit(pytest.main([__file__]))
@@ -0,0 +1,127 @@
+# test_word_info.py
+# get_word_info against tiny pitch/JMdict/frequency databases
+
+import sys
+import os
+import json
+import sqlite3
+import pytest
+# Sets up the add-on package, also when this is run as a script
+import conftest  # noqa: F401
+from japanese_word_creator.dictdata import lookups, db_pool, dictdb, example_store
+from japanese_word_creator.dictdata.lookup_cache import invalidate
+
+
+def _point_at(monkeypatch, tmp_path):
+    # Points the lookups at tmp_path and gives them a small frequency DB
+    for name, filename in [('PITCH_DB_PATH', 'wadoku_pitchdb.csv'),
+                           ('PITCH_DB_SQLITE_PATH', 'wadoku_pitchdb.sqlite'),
+                           ('JM_DICT_PATH', 'JMdict_e_examp.XML'),
+                           ('JMDICT_JSON_PATH', 'JMdict_e_examp.json'),
+                           ('JMDICT_SQLITE_PATH', 'JMdict_e_examp.sqlite'),
+                           ('FREQ_SQLITE_PATH', 'japanese_word_frequencies.sqlite')]:
+        monkeypatch.setattr(lookups, name, os.path.join(tmp_path, filename))
+    monkeypatch.setattr(lookups, '_ensure_sqlite_ran', False)
+    monkeypatch.setattr(lookups, '_complete_jmdict_dbs', set())
+    monkeypatch.setattr(example_store, 'EXAMPLES_DB_PATH', os.path.join(tmp_path, 'kanji_examples.sqlite'))
+    monkeypatch.setattr(example_store, 'EXAMPLES_JSON_PATH', os.path.join(tmp_path, 'kanji_examples.json'))
+    conn = sqlite3.connect(lookups.FREQ_SQLITE_PATH)
+    conn.execute('CREATE TABLE word_readings (word TEXT, reading TEXT, frequency INTEGER, PRIMARY KEY (word, reading))')
+    conn.executemany('INSERT INTO word_readings VALUES (?, ?, ?)', [('秋', 'アキ', 120), ('秋', 'シュウ', 7)])
+    conn.commit()
+    conn.close()
+    invalidate()
+
+
+def test_get_word_info(pitch_db, jmdict_db, monkeypatch, tmp_path):
+    _point_at(monkeypatch, tmp_path)
+    info = lookups.get_word_info('飯')
+    assert info.word == '飯'
+    assert [e['kana'] for e in info.pitch_entries] == ['いい', 'いい', 'めし']
+    assert [(e['kana'], e['pattern']) for e in info.unique_pitch()] == [('いい', 'HLL'), ('めし', 'LHL')]
+    assert info.accented_readings() == ['いい', 'め＼し']
+    # The cached pitch result is shared, so it holds no lists
+    assert lookups.lookup_pitch_accent('飯')[0] == ('いい', 'め＼し')
+    assert lookups.lookup_pitch_accent_many(['飯'])['飯'][2] == ('HLL', 'HLL', 'LHL')
+    assert info.jmdict_entries == ()
+    assert info.frequency == 0
+    info = lookups.get_word_info('秋')
+    assert info.pitch_entries == ()
+    assert info.kana_readings() == ['あき']
+    assert info.meanings() == ['autumn; fall']
+    assert info.frequency == 120
+    # Built with the DBs; misses are answered by the bloom filters
+    assert lookups._absent(jmdict_db, 'の')
+    assert not lookups._absent(jmdict_db, '秋')
+    assert lookups._maybe_present(lookups.FREQ_SQLITE_PATH, ['秋', '春']) == ['秋']
+    assert lookups.get_word_frequency_many(['秋', '春']) == {'秋': 120, '春': 0}
+    assert lookups.get_reading_frequencies([('秋', 'あき'), ('秋', 'しゅう'), ('秋', 'とき')]) == {
+        ('秋', 'あき'): 120, ('秋', 'しゅう'): 7, ('秋', 'とき'): -1}
+    try:
+        info.frequency = 1
+        assert False, 'WordInfo should be immutable'
+    except AttributeError:
+        pass
+    try:
+        info.jmdict_entries[0]['meanings'] = []
+        assert False, 'WordInfo rows should be read-only'
+    except TypeError:
+        pass
+    assert info.jmdict_entries[0]['meanings'] == ('autumn; fall',)
+    example_store.close_store()
+
+
+def test_jmdict_json_fallback_only_without_complete_db(wadoku_sample, jmdict_sample, write_file, monkeypatch, tmp_path):
+    _point_at(monkeypatch, tmp_path)
+    # No DBs yet: the lookups build them from these on first use
+    write_file(lookups.PITCH_DB_PATH, wadoku_sample)
+    write_file(lookups.JM_DICT_PATH, jmdict_sample)
+    spring = {'kanjis': ['春'], 'kanas': ['はる'], 'meanings': ['spring']}
+    with open(lookups.JMDICT_JSON_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'春': [spring]}, f, ensure_ascii=False)
+    lookups._jmdict_json_index.reset()
+    # While the DB is being built elsewhere, a small export fills in
+    dictdb.defer_builds(True)
+    try:
+        assert lookups.lookup_jmdict('春') == [spring]
+        monkeypatch.setattr(lookups, 'JMDICT_JSON_FALLBACK_MAX_MB', 0)
+        lookups._jmdict_json_index.reset()
+        invalidate()
+        assert lookups.lookup_jmdict('春') == []
+        monkeypatch.setattr(lookups, 'JMDICT_JSON_FALLBACK_MAX_MB', 64)
+        lookups._jmdict_json_index.reset()
+    finally:
+        dictdb.defer_builds(False)
+    # Once the DB is complete a miss is final and the export is dropped
+    lookups._ensure_sqlite_ran = False
+    invalidate()
+    assert lookups.lookup_jmdict('秋')[0]['meanings'] == ['autumn; fall']
+    # Callers get copies; changing one leaves the cached entry alone
+    lookups.lookup_jmdict('秋')[0]['meanings'].append('changed')
+    assert lookups.lookup_jmdict_many(['秋'])['秋'][0]['meanings'] == ['autumn; fall']
+    assert lookups.jmdict_db_is_complete()
+    assert lookups.lookup_jmdict('春') == []
+    assert not lookups._jmdict_json_index.loaded()
+    invalidate()
+    db_pool.close_all()
+
+
+def test_kanji_info_index(monkeypatch):
+    index = lookups.build_kanji_info_index([
+        {'kanji': '飯', 'number_of_strokes': 12, 'related_words': 'ご飯, 朝飯,,夕飯 '},
+        {'kanji': '飯', 'number_of_strokes': 99},
+    ])
+    assert index['飯']['strokes'] == 12
+    assert index['飯']['related_words'] == ['ご飯', '朝飯', '夕飯']
+    # Cached blocks are read-only views of the index
+    monkeypatch.setattr(lookups, 'kanji_info_index', lambda: index)
+    invalidate('kanji_info')
+    blocks = lookups.get_kanji_info_blocks('ご飯')
+    assert blocks[0]['related_words'] == ('ご飯', '朝飯', '夕飯')
+    with pytest.raises(TypeError):
+        blocks[0]['strokes'] = 1
+    invalidate('kanji_info')
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
@@ -1,17 +1,12 @@
 from aqt.qt import *
 from aqt import mw
 from aqt.utils import showInfo
-from anki.notes import Note
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QProgressBar
-from .pitch_svg import hira_to_mora, create_svg_pitch_pattern, create_html_pitch_pattern, extract_unique_pitch_patterns
-import os
-import sys
-import sqlite3
+from .pitch_svg import pitch_fields, pitch_pairs, check_field_format
+from .dictdata import lookup_pitch_entries_many
+from .deck_worker import DeckJobDialog
 
-ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(ADDON_DIR, 'data')
-
-class PitchAccentDeckFieldSelector(QDialog):
+class PitchAccentDeckFieldSelector(DeckJobDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Pitch Accent Deck/Field Selector")
@@ -54,7 +49,7 @@ class PitchAccentDeckFieldSelector(QDialog):
         btns.addWidget(self.cancel_btn)
         layout.addLayout(btns)
         self.ok_btn.clicked.connect(self.accept)
-        self.cancel_btn.clicked.connect(self.reject)
+        self.cancel_btn.clicked.connect(self.cancel)
 
     def update_fields(self):
         deck_name = self.deck_combo.currentText()
@@ -80,55 +75,70 @@ class PitchAccentDeckFieldSelector(QDialog):
         if not (deck_id and field1 and field2):
             showInfo("Please select a deck and two fields.")
             return
-        # Get all note ids in the selected deck
-        nids = mw.col.db.list("select nid from cards where did=?", deck_id)
-        total = len(set(nids))
-        updated = 0
-        addon_init = sys.modules.get('japanese_word_creator')
-        if not addon_init or not hasattr(addon_init, "lookup_pitch_accent"):
-            showInfo("Could not import pitch accent functions from __init__.py. Aborting.")
-            return
-        for i, nid in enumerate(set(nids)):
-            note = mw.col.getNote(nid)
-            if field1 in note and field2 in note:
-                input_value = note[field1]
-                # --- Use the same logic as in __init__.py: fetch all (kana, pattern) pairs from DB ---
-                pitch_html = ''
-                entries = []
-                # Use the same DB path as in __init__.py
-                PITCH_DB_SQLITE_PATH = addon_init.PITCH_DB_SQLITE_PATH
-                addon_init.ensure_pitchdb_sqlite()
-                try:
-                    if os.path.exists(PITCH_DB_SQLITE_PATH):
-                        conn = sqlite3.connect(PITCH_DB_SQLITE_PATH)
-                        c = conn.cursor()
-                        c.execute('SELECT kana, pattern FROM pitch_accents WHERE kanji=? OR kana=?', (input_value, input_value))
-                        for row in c.fetchall():
-                            kana, pattern = row
-                            entries.append({'kana': kana, 'pattern': pattern})
-                        conn.close()
-                except Exception:
-                    pass
-                # Deduplicate (kana, pattern) pairs before SVG generation
-                unique_pitch = extract_unique_pitch_patterns(entries)
-                for entry in unique_pitch:
-                    formatted_pattern = addon_init.format_pitch_pattern(entry['pattern'])
-                    svg = create_html_pitch_pattern(entry['kana'], formatted_pattern)
-                    pitch_html += f'<div class="pitch-accent-block">{svg}</div>'
-                note[field2] = pitch_html
-                note.flush()
-                updated += 1
-            # Update progress bar
-            if total > 0:
-                percent = int((i + 1) / total * 100)
-                self.progress.setValue(percent)
-                QApplication.processEvents()
-        mw.col.reset()
-        showInfo(f"Updated {updated} notes in deck '{deck_name}'.")
-        super().accept()
-
-# In get_reading_frequencies and any other place, update the path:
-freq_db_path = os.path.join(DATA_DIR, 'japanese_word_frequencies.sqlite')
+        def work(col, report):
+            return pitch_note_updates(col, read_deck_fields(col, deck_id, field1, field2), field2, report)
+        self.run_job(work, lambda updated: showInfo(f"Updated {updated} notes in deck '{deck_name}'."))
+
+# --- Batch engine ---
+# The whole deck is handled as set operations: one query reads the two
+# fields of every note, then chunks of notes get one bulk pitch lookup and
+# one render_many pass each, and only the notes that actually change are
+# loaded. DeckJobDialog saves them with a single update_notes call (one
+# undo entry).
+
+# Notes per lookup/render chunk, between progress reports
+CHUNK_NOTES = 1000
+
+def read_deck_fields(col, deck_id, source_field, target_field):
+    """
+    (note id, source text, target text) for every note of the deck whose
+    note type has both fields, read straight from the notes table in one
+    query instead of loading each note.
+    """
+    ords = {}
+    rows = []
+    for nid, mid, flds in col.db.all(
+            "select id, mid, flds from notes where id in (select nid from cards where did=?)", deck_id):
+        if mid not in ords:
+            note_type = col.models.get(mid)
+            field_map = col.models.field_map(note_type)
+            ords[mid] = None
+            if source_field in field_map and target_field in field_map:
+                # Pitch data would show up as text on cards that cannot draw it
+                check_field_format(note_type)
+                ords[mid] = (field_map[source_field][0], field_map[target_field][0])
+        if ords[mid] is None:
+            continue
+        values = flds.split('\x1f')
+        rows.append((nid, values[ords[mid][0]], values[ords[mid][1]]))
+    return rows
+
+def pitch_field_updates(rows):
+    """
+    (note id, new pitch field) for the rows of read_deck_fields whose
+    target field would change. Every word is looked up in one query and
+    each distinct diagram is rendered once.
+    """
+    entries_by_word = lookup_pitch_entries_many([word for _nid, word, _old in rows])
+    fields = pitch_fields(pitch_pairs(entries_by_word.get(word, [])) for _nid, word, _old in rows)
+    return [(nid, new) for (nid, _word, old), new in zip(rows, fields) if new != old]
+
+def pitch_note_updates(col, rows, field, report=None):
+    """
+    The notes of rows whose field gets a new pitch field, loaded and
+    updated but not saved. report(done, total), if given, is called after
+    every CHUNK_NOTES rows.
+    """
+    notes = []
+    for start in range(0, len(rows), CHUNK_NOTES):
+        chunk = rows[start:start + CHUNK_NOTES]
+        for nid, value in pitch_field_updates(chunk):
+            note = col.get_note(nid)
+            note[field] = value
+            notes.append(note)
+        if report:
+            report(start + len(chunk), len(rows))
+    return notes
 
 # Add menu entry to Tools menu
 _menu_entry_added_pitch = False
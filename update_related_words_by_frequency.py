@@ -1,18 +1,15 @@
 from aqt.qt import *
 from aqt import mw
 from aqt.utils import showInfo
-from anki.notes import Note
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QProgressBar
 import os
-import sys
-import sqlite3
 import re
+from .dictdata import FREQ_SQLITE_PATH as FREQ_DB_PATH
+from .dictdata import get_connection, get_word_frequency, get_word_frequency_many
+from .dictdata.dictdb import ensure_frequency_db, max_frequency
+from .deck_worker import DeckJobDialog
 
-ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(ADDON_DIR, 'data')
-FREQ_DB_PATH = os.path.join(DATA_DIR, 'japanese_word_frequencies.sqlite')
-
-class RelatedWordsFrequencySorter(QDialog):
+class RelatedWordsFrequencySorter(DeckJobDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Sort Related Words by Frequency")
@@ -52,7 +49,7 @@ class RelatedWordsFrequencySorter(QDialog):
         btns.addWidget(self.cancel_btn)
         layout.addLayout(btns)
         self.ok_btn.clicked.connect(self.accept)
-        self.cancel_btn.clicked.connect(self.reject)
+        self.cancel_btn.clicked.connect(self.cancel)
 
     def update_fields(self):
         deck_name = self.deck_combo.currentText()
@@ -81,18 +78,6 @@ class RelatedWordsFrequencySorter(QDialog):
                 kata += ch
         return kata
 
-    def get_word_frequency(self, word, conn):
-        # Query all readings for the word and use the max frequency (kanji_lookup logic)
-        try:
-            c = conn.cursor()
-            c.execute('SELECT reading, frequency FROM word_readings WHERE word=?', (word,))
-            rows = c.fetchall()
-            if rows:
-                return max(row[1] for row in rows if row[1] is not None)
-        except Exception:
-            pass
-        return 0
-
     def accept(self):
         deck_name = self.deck_combo.currentText()
         deck_id = self.deck_map.get(deck_name)
@@ -100,42 +85,47 @@ class RelatedWordsFrequencySorter(QDialog):
         if not (deck_id and field):
             showInfo("Please select a deck and a field.")
             return
-        nids = mw.col.db.list("select nid from cards where did=?", deck_id)
-        total = len(set(nids))
-        updated = 0
         if not os.path.exists(FREQ_DB_PATH):
             showInfo("Frequency database not found: {}".format(FREQ_DB_PATH))
             return
+        # The frequency tables, if missing, are added in the background op by
+        # get_word_frequency_many (and not at all while builds are deferred)
         try:
-            conn = sqlite3.connect(FREQ_DB_PATH)
+            get_connection(FREQ_DB_PATH)
         except Exception:
             showInfo("Could not open frequency database.")
             return
-        for i, nid in enumerate(set(nids)):
-            note = mw.col.getNote(nid)
+        self.run_job(lambda col, report: self.note_updates(col, deck_id, field, report),
+                     lambda updated: showInfo(f"Updated {updated} notes in deck '{deck_name}'."))
+
+    def note_updates(self, col, deck_id, field, report):
+        # Runs in the DeckJob's background op: the deck's notes with field sorted, unsaved
+        nids = col.db.list("select nid from cards where did=?", deck_id)
+        # First pass: collect the notes and their words
+        jobs = []
+        for nid in set(nids):
+            note = col.get_note(nid)
             if field in note:
                 related = note[field]
                 words = [w.strip() for w in related.replace('\n', ',').replace('、', ',').replace(';', ',').split(',') if w.strip()]
-                if not words:
-                    continue
-                # Get frequency for each word
-                freq_pairs = [(w, self.get_word_frequency(w, conn)) for w in words]
-                # Sort by frequency descending, then by word
-                freq_pairs.sort(key=lambda x: (-x[1], x[0]))
-                sorted_words = [w for w, _ in freq_pairs]
-                new_value = ', '.join(sorted_words)
+                if words:
+                    jobs.append((note, words))
+        # Get frequency for every word of the deck in one query
+        freqs = get_word_frequency_many([w for _note, words in jobs for w in words])
+        total = len(jobs)
+        notes = []
+        for i, (note, words) in enumerate(jobs):
+            freq_pairs = [(w, freqs.get(w, 0)) for w in words]
+            # Sort by frequency descending, then by word
+            freq_pairs.sort(key=lambda x: (-x[1], x[0]))
+            sorted_words = [w for w, _ in freq_pairs]
+            new_value = ', '.join(sorted_words)
+            # Unchanged notes are not written again
+            if note[field] != new_value:
                 note[field] = new_value
-                note.flush()
-                updated += 1
-            # Update progress bar
-            if total > 0:
-                percent = int((i + 1) / total * 100)
-                self.progress.setValue(percent)
-                QApplication.processEvents()
-        conn.close()
-        mw.col.reset()
-        showInfo(f"Updated {updated} notes in deck '{deck_name}'.")
-        super().accept()
+                notes.append(note)
+            report(i + 1, total)
+        return notes
 
 _menu_entry_added_related = False
 
@@ -155,14 +145,11 @@ from anki.hooks import addHook
 addHook("profileLoaded", on_main_menu_add_related)
 
 def get_word_frequency_standalone(word, db_path=FREQ_DB_PATH):
+    if db_path == FREQ_DB_PATH:
+        return get_word_frequency(word)
+    ensure_frequency_db(db_path)
     try:
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        c.execute('SELECT reading, frequency FROM word_readings WHERE word=?', (word,))
-        rows = c.fetchall()
-        conn.close()
-        if rows:
-            return max(row[1] for row in rows if row[1] is not None)
+        return max_frequency(get_connection(db_path), word)[0]
     except Exception:
         pass
     return 0
@@ -188,11 +175,9 @@ def show_first_frequencies(n=20):
         print(f"Frequency database not found: {FREQ_DB_PATH}")
         return
     try:
-        conn = sqlite3.connect(FREQ_DB_PATH)
-        c = conn.cursor()
+        c = get_connection(FREQ_DB_PATH).cursor()
         c.execute('SELECT word, frequency FROM word_readings LIMIT ?', (n,))
         rows = c.fetchall()
-        conn.close()
         if not rows:
             print("No rows found in word_readings table.")
         else:
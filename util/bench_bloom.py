@@ -0,0 +1,58 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Paths
+BASE_DIR = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(BASE_DIR, '..')))
+
+from dictdata import FREQ_SQLITE_PATH as FREQ_DB_PATH
+from dictdata import bloom, dictdb
+from dictdata.db_pool import close_all, get_connection, get_key_filter
+
+def absent_words(conn, words):
+    # Typical misses: inflected forms, particles glued on, short phrases
+    candidates = []
+    for w in words:
+        candidates.extend((w + 'ました', w + 'を', 'の' + w, w + w))
+    present = {row[0] for row in conn.execute(
+        'SELECT word FROM word_readings WHERE word IN (SELECT value FROM json_each(?))',
+        (json.dumps(candidates, ensure_ascii=False),))}
+    return [c for c in dict.fromkeys(candidates) if c not in present]
+
+def main(n=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        # Work on a copy so data/ is left alone
+        db_path = os.path.join(tmp, os.path.basename(FREQ_DB_PATH))
+        shutil.copyfile(FREQ_DB_PATH, db_path)
+        # Derived tables as in a real install, then the filter build on its own
+        dictdb.build_frequency_tables(db_path)
+        stats = dictdb.build_key_filter(db_path, dictdb.FREQUENCY_KEYS_SQL)
+        header = bloom.read_header(bloom.bloom_path(db_path))
+        conn = get_connection(db_path)
+        words = [row[0] for row in conn.execute('SELECT DISTINCT word FROM word_readings LIMIT ?', (n,))]
+        misses = absent_words(conn, words)
+        f = get_key_filter(db_path)
+        assert all(w in f for w in words), 'false negative'
+        rate = bloom.measure_false_positive_rate(f, misses)
+        start = time.perf_counter()
+        for w in misses:
+            w in f
+        filtered = time.perf_counter() - start
+        # What a miss costs get_word_frequency and get_reading_frequencies without the filter
+        start = time.perf_counter()
+        for w in misses:
+            dictdb.max_frequency(conn, w)
+            dictdb.reading_frequencies(conn, w)
+        probed = time.perf_counter() - start
+        print(f"{stats['rows']} keys, {header[1] // 8 / 1024:.0f} KiB, {header[0]} hashes, built in {stats['seconds']:.2f}s")
+        print(f"false positives : {rate * 100:.2f}% of {len(misses)} absent words (target {bloom.DEFAULT_ERROR_RATE * 100:.0f}%)")
+        print(f"sqlite queries  : {probed / len(misses) * 1e6:.1f} us/miss")
+        print(f"bloom filter    : {filtered / len(misses) * 1e6:.1f} us/miss")
+        close_all()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+
+# Paths
+BASE_DIR = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(BASE_DIR, '..')))
+
+from dictdata import KANJI_INFO_PATH, FREQ_SQLITE_PATH as FREQ_DB_PATH
+from dictdata.lookups import build_kanji_info_index
+
+def load_kanji_info(words):
+    # Use the real kanji list if present, otherwise 2136 kanji taken from the word list
+    if os.path.exists(KANJI_INFO_PATH):
+        with open(KANJI_INFO_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    kanji = list(dict.fromkeys(ch for w in words for ch in w if '一' <= ch <= '鿿'))[:2136]
+    related = ', '.join('関連語{}'.format(i) for i in range(30))
+    return [{'kanji': ch, 'meaning': 'm', 'related_words': related} for ch in kanji]
+
+def load_words(n):
+    conn = sqlite3.connect(FREQ_DB_PATH)
+    words = [row[0] for row in conn.execute('SELECT DISTINCT word FROM word_readings LIMIT ?', (n,))]
+    conn.close()
+    return words
+
+def old_blocks(word, entries):
+    # The previous linear scan, re-splitting related_words on every call
+    blocks = []
+    for ch in word:
+        if ord(ch) < 0x4e00 or ord(ch) > 0x9fff:
+            continue
+        for entry in entries:
+            if entry.get('kanji') == ch:
+                blocks.append({
+                    'kanji': ch,
+                    'meaning': entry.get('meaning', ''),
+                    'related_words': [w.strip() for w in entry.get('related_words', '').split(',') if w.strip()][:20]
+                })
+                break
+    return blocks
+
+def new_blocks(word, index):
+    return [index[ch] for ch in word if '一' <= ch <= '鿿' and ch in index]
+
+def main(n=20000):
+    words = load_words(n)
+    entries = load_kanji_info(words)
+    start = time.perf_counter()
+    index = build_kanji_info_index(entries)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    old_total = sum(len(old_blocks(w, entries)) for w in words)
+    old = time.perf_counter() - start
+    start = time.perf_counter()
+    new_total = sum(len(new_blocks(w, index)) for w in words)
+    new = time.perf_counter() - start
+    assert old_total == new_total
+    print(f"{len(entries)} kanji, {len(words)} words, {new_total} blocks")
+    print(f"index build : {build * 1000:.1f} ms (once per session)")
+    print(f"linear scan : {old * 1000:.1f} ms ({old / len(words) * 1e6:.1f} us/word)")
+    print(f"keyed index : {new * 1000:.1f} ms ({new / len(words) * 1e6:.1f} us/word)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import importlib.util
+import os
+import re
+import sys
+import time
+
+# Paths
+BASE_DIR = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(BASE_DIR, '..')))
+
+from dictdata import DATA_DIR, PITCH_DB_PATH
+from dictdata.dictdb import iter_pitch_rows
+# pitch_svg imports dictdata relatively: load it as part of the add-on
+# package (without running its __init__, which needs Anki)
+_spec = importlib.util.spec_from_file_location(
+    'japanese_word_creator', os.path.join(BASE_DIR, '..', '__init__.py'),
+    submodule_search_locations=[os.path.abspath(os.path.join(BASE_DIR, '..'))])
+sys.modules['japanese_word_creator'] = importlib.util.module_from_spec(_spec)
+from japanese_word_creator.pitch_svg import to_mora, to_mora_many
+
+ACCENTS_PATH = os.path.join(DATA_DIR, 'accents.txt')
+
+def load_readings():
+    # Every kana spelling in the wadoku list, or the readings of accents.txt without it
+    if os.path.exists(PITCH_DB_PATH):
+        return [row[1] for row in iter_pitch_rows(PITCH_DB_PATH)], 'wadoku_pitchdb.csv'
+    with open(ACCENTS_PATH, encoding='utf-8') as f:
+        return [line.split('\t')[1] for line in f if line.count('\t') >= 2], 'accents.txt'
+
+def old_katakana_to_hiragana(text):
+    return ''.join(chr(ord(ch) - 0x60) if 'ァ' <= ch <= 'ン' else ch for ch in text)
+
+def old_hira_to_mora(hira):
+    # The previous tokenizer: re.match per character, combiners in a list
+    hira = ''.join(c for c in hira if re.match(r'[ぁ-ゖー]', c))
+    mora_arr = []
+    combiners = ['ゃ', 'ゅ', 'ょ', 'ぁ', 'ぃ', 'ぅ', 'ぇ', 'ぉ',
+                 'ャ', 'ュ', 'ョ', 'ァ', 'ィ', 'ゥ', 'ェ', 'ォ']
+    i = 0
+    while i < len(hira):
+        if i+1 < len(hira) and hira[i+1] in combiners:
+            mora_arr.append(hira[i] + hira[i+1])
+            i += 2
+        else:
+            mora_arr.append(hira[i])
+            i += 1
+    return mora_arr
+
+def timed(fn, repeat=5):
+    # Best of repeat runs
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main():
+    readings, source = load_readings()
+    print(f"{len(readings)} readings from {source} ({len(set(readings))} distinct)")
+    old, old_t = timed(lambda: [old_hira_to_mora(old_katakana_to_hiragana(r)) for r in readings])
+    new, new_t = timed(lambda: [to_mora(r) for r in readings])
+    many, many_t = timed(lambda: to_mora_many(readings))
+    assert old == new == many, 'tokenizers disagree'
+    print(f"old hira_to_mora : {old_t:.3f}s ({old_t / len(readings) * 1e6:.2f} us/reading)")
+    print(f"to_mora          : {new_t:.3f}s ({new_t / len(readings) * 1e6:.2f} us/reading), {old_t / new_t:.1f}x")
+    print(f"to_mora_many     : {many_t:.3f}s ({many_t / len(readings) * 1e6:.2f} us/reading), {old_t / many_t:.1f}x")
+
+if __name__ == '__main__':
+    main()
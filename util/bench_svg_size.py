@@ -0,0 +1,87 @@
+import importlib.util
+import os
+import sqlite3
+import sys
+import time
+import zlib
+
+# Paths
+BASE_DIR = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(BASE_DIR, '..')))
+
+from dictdata import DATA_DIR, FREQ_SQLITE_PATH as FREQ_DB_PATH
+# pitch_svg imports dictdata relatively: load it as part of the add-on
+# package (without running its __init__, which needs Anki)
+_spec = importlib.util.spec_from_file_location(
+    'japanese_word_creator', os.path.join(BASE_DIR, '..', '__init__.py'),
+    submodule_search_locations=[os.path.abspath(os.path.join(BASE_DIR, '..'))])
+sys.modules['japanese_word_creator'] = importlib.util.module_from_spec(_spec)
+from japanese_word_creator.pitch_svg import hira_to_mora, katakana_to_hiragana, pitch_fields
+
+ACCENTS_PATH = os.path.join(DATA_DIR, 'accents.txt')
+
+def load_accents():
+    # {(word, reading): [accent numbers]} from accents.txt
+    accents = {}
+    with open(ACCENTS_PATH, encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) < 3 or line.startswith('//'):
+                continue
+            word, reading, numbers = parts[:3]
+            accents[(word, reading or word)] = [int(n) for n in numbers.split(',') if n.strip().isdigit()]
+    return accents
+
+def accent_pattern(n_mora, accent):
+    # One L/H per mora plus the following particle, as in the pitch DB
+    if accent == 0:
+        return 'L' + 'H' * n_mora
+    if accent == 1:
+        return 'H' + 'L' * n_mora
+    return 'L' + 'H' * (accent - 1) + 'L' * (n_mora - accent + 1)
+
+def load_deck(n):
+    # The n most frequent words with a known accent, one note per word
+    accents = load_accents()
+    by_word = {}
+    for (word, reading), numbers in accents.items():
+        by_word.setdefault(word, []).append((reading, numbers))
+    conn = sqlite3.connect(FREQ_DB_PATH)
+    notes = []
+    for (word,) in conn.execute('SELECT word FROM word_readings GROUP BY word ORDER BY MAX(frequency) DESC'):
+        if word not in by_word:
+            continue
+        pairs = []
+        for reading, numbers in by_word[word]:
+            kana = katakana_to_hiragana(reading)
+            n_mora = len(hira_to_mora(kana))
+            pairs.extend((kana, accent_pattern(n_mora, a)) for a in numbers if a <= n_mora)
+        if pairs:
+            notes.append(pairs)
+        if len(notes) == n:
+            break
+    conn.close()
+    return notes
+
+def main(n=5000):
+    notes = load_deck(n)
+    diagrams = sum(len(pairs) for pairs in notes)
+    print(f"{len(notes)} notes, {diagrams} diagrams")
+    sizes = {}
+    # The pitch_accent fields the deck tool writes for these notes, per field format/style
+    for label, field_format, style in (('card', 'svg', 'card'), ('compact', 'svg', 'compact'), ('data', 'data', None)):
+        start = time.perf_counter()
+        fields = [f.encode('utf-8') for f in pitch_fields(notes, field_format, style)]
+        elapsed = time.perf_counter() - start
+        # Raw is what the collection stores; the whole deck compressed is
+        # roughly what a full sync uploads
+        sizes[label] = (sum(map(len, fields)), len(zlib.compress(b''.join(fields))))
+        raw, packed = sizes[label]
+        print(f"{label:8}: {raw / 1024:6.0f} KiB ({raw / len(notes):4.0f} B/note), "
+              f"{packed / 1024:6.0f} KiB compressed, rendered in {elapsed:.2f}s")
+    for label in ('compact', 'data'):
+        print(f"{label} saves {(1 - sizes[label][0] / sizes['card'][0]) * 100:.1f}% raw, "
+              f"{(1 - sizes[label][1] / sizes['card'][1]) * 100:.1f}% compressed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import os
+import sqlite3
+import sys
+from collections import Counter
+
+# Paths
+BASE_DIR = os.path.dirname(__file__)
+sys.path.insert(0, os.path.abspath(os.path.join(BASE_DIR, '..')))
+
+from dictdata import PITCH_DB_SQLITE_PATH
+from dictdata import dictdb
+
+def main():
+    # Wadoku rows whose pattern had to be padded or cut to fit the reading
+    if not os.path.exists(PITCH_DB_SQLITE_PATH):
+        print(f"{PITCH_DB_SQLITE_PATH} not built yet")
+        return
+    if dictdb.pitch_tables_need_build(PITCH_DB_SQLITE_PATH):
+        dictdb.report_build('pitch patterns', dictdb.build_pitch_tables(PITCH_DB_SQLITE_PATH))
+    conn = sqlite3.connect(PITCH_DB_SQLITE_PATH)
+    counts = Counter(alignment for alignment, in conn.execute('SELECT alignment FROM pitch_pattern'))
+    rows = dictdb.misaligned_pitch_patterns(conn)
+    conn.close()
+    for kanji, kana, pattern, pos, heights, alignment in rows:
+        print(f"{kanji}\t{kana}\t{pattern}\t#{pos}\t{alignment} -> {heights}")
+    total = sum(counts.values())
+    print(f"{len(rows)} of {total} patterns misaligned; "
+          + ', '.join(f"{name}: {n}" for name, n in counts.most_common()))
+
+if __name__ == '__main__':
+    main()